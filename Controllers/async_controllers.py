@@ -0,0 +1,231 @@
+from Controllers.cache import LRUCache
+from Controllers.controllers import BookValidation, UserValidation
+from Controllers.controllers import ITERSIZE, order_by_clause, split_cached
+from Controllers.metrics import instrumented
+from Exceptions.exceptions import DuplicateError
+from Models.models import Book, User
+from async_db_connection import acquire
+import asyncpg
+
+
+def affected_rows(status):
+    # asyncpg returns the command tag, e.g. "UPDATE 1"
+    return int(status.split()[-1])
+
+
+class AsyncBookController(BookValidation):
+    """asyncio counterpart of BookController backed by a pool of asyncpg connections.
+
+    Validation, exceptions and return values match the sync controller and
+    rows are returned as Models.models.Book records. Each operation borrows a pooled connection,
+    so many lookups can be awaited concurrently with at most DB_POOL_MAX
+    queries in flight.
+    """
+    columns = Book._fields
+
+    def __init__(self) -> None:
+        self.cache = LRUCache()
+
+    @instrumented
+    async def add_book(self, title, author, year, genre, code, upsert=False):
+        self.validate_book_fields(title, author, year, genre, code)
+        if upsert:
+            query = ("""
+                 INSERT INTO books (title, author, year, genre, isbn_code) VALUES ($1, $2, $3, $4, $5)
+                 ON CONFLICT (isbn_code) DO UPDATE
+                 SET (title, author, year, genre) = (EXCLUDED.title, EXCLUDED.author, EXCLUDED.year, EXCLUDED.genre)
+                 RETURNING id;
+                 """)
+        else:
+            query = ("""
+                 INSERT INTO books (title, author, year, genre, isbn_code) VALUES ($1, $2, $3, $4, $5)
+                 ON CONFLICT (isbn_code) DO NOTHING
+                 RETURNING id;
+                 """)
+        async with acquire() as conn:
+            inserted = await conn.fetchval(query, title, author, int(year), genre, str(code))
+        if inserted is None:
+            raise DuplicateError(code)
+        self.cache.delete(str(code))
+        return "Success! Book registered!"
+
+    @instrumented
+    async def list_all_books(self):
+        async with acquire() as conn:
+            result = await conn.fetch("SELECT * FROM books")
+        return [Book._make(row) for row in result] if result else None
+
+    @instrumented
+    async def iter_books(self, after_id=None, itersize=None, order_by='id', descending=False):
+        """Stream books through a server-side cursor, ``itersize`` rows per fetch"""
+        query = f"SELECT * FROM books WHERE id > $1 ORDER BY {order_by_clause(order_by, self.columns, descending)}"
+        async with acquire() as conn:
+            async with conn.transaction():
+                async for row in conn.cursor(query, after_id if after_id is not None else 0,
+                                             prefetch=itersize or ITERSIZE):
+                    yield Book._make(row)
+
+    @instrumented
+    async def search_by_book_code(self, code):
+        result = self.cache.get(str(code))
+        if result is not None:
+            return result
+        async with acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM books WHERE isbn_code = $1", str(code))
+        if row is None:
+            return None
+        result = Book._make(row)
+        self.cache.set(str(code), result)
+        return result
+
+    @instrumented
+    async def get_many(self, isbns):
+        """Resolve many ISBNs at once: ``{isbn: row}``, None for unknown codes.
+
+        Cached books are answered locally and the rest are fetched in a
+        single query.
+        """
+        codes = list(dict.fromkeys(str(code) for code in isbns))
+        found, missing = split_cached(self.cache, codes)
+        if missing:
+            async with acquire() as conn:
+                rows = await conn.fetch("SELECT * FROM books WHERE isbn_code = ANY($1::varchar[]);", missing)
+            for book in map(Book._make, rows):
+                found[book.isbn_code] = book
+                self.cache.set(book.isbn_code, book)
+        return {code: found.get(code) for code in codes}
+
+    @instrumented
+    async def search(self, text, limit=10):
+        """Top ``limit`` books whose title or author resemble ``text`` (pg_trgm)"""
+        text = (text or '').strip()
+        if not text:
+            return []
+        query = ("""
+                 SELECT * FROM books
+                 WHERE $1 <% title OR $1 <% author
+                 ORDER BY greatest(word_similarity($1, title), word_similarity($1, author)) DESC, id
+                 LIMIT $2;
+                 """)
+        async with acquire() as conn:
+            result = await conn.fetch(query, text, limit)
+        return [Book._make(row) for row in result]
+
+    @instrumented
+    async def update_book(self, code, title=None, author=None, year=None, genre=None):
+        query = ("""
+                 UPDATE books SET (title, author, year, genre) = ($1, $2, $3, $4)
+                 WHERE isbn_code = $5;
+                 """)
+        self.validate_book_fields(title, author, year, genre, code)
+        async with acquire() as conn:
+            status = await conn.execute(query, title, author, int(year), genre, str(code))
+        if not affected_rows(status):
+            return None
+        self.cache.delete(str(code))
+        return True
+
+    @instrumented
+    async def delete_book(self, code):
+        async with acquire() as conn:
+            status = await conn.execute("DELETE FROM books WHERE isbn_code = $1", str(code))
+        self.cache.delete(str(code))
+        return bool(affected_rows(status))
+
+
+class AsyncUserController(UserValidation):
+    """asyncio counterpart of UserController backed by a pool of asyncpg connections"""
+    columns = User._fields
+
+    def __init__(self) -> None:
+        self.cache = LRUCache()
+
+    @instrumented
+    async def register_user(self, name, email, phone, user_code, upsert=False):
+        self.validate_user_fields(name, email, phone, user_code)
+        if upsert:
+            query = ("""
+                 INSERT INTO users (name, email, phone, user_code) VALUES ($1, $2, $3, $4)
+                 ON CONFLICT (user_code) DO UPDATE
+                 SET (name, email, phone) = (EXCLUDED.name, EXCLUDED.email, EXCLUDED.phone)
+                 RETURNING id;
+                 """)
+        else:
+            query = ("""
+                 INSERT INTO users (name, email, phone, user_code) VALUES ($1, $2, $3, $4)
+                 ON CONFLICT DO NOTHING
+                 RETURNING id;
+                 """)
+        try:
+            async with acquire() as conn:
+                inserted = await conn.fetchval(query, name, email, phone, user_code)
+        except asyncpg.UniqueViolationError:
+            # the upsert only resolves user code conflicts, the e-mail belongs to another user
+            raise DuplicateError(user_code, entity="User") from None
+        if inserted is None:
+            raise DuplicateError(user_code, entity="User")
+        self.cache.delete(str(user_code))
+        return "Success! User registered."
+
+    @instrumented
+    async def list_users(self):
+        async with acquire() as conn:
+            result = await conn.fetch("SELECT * FROM users")
+        return [User._make(row) for row in result]
+
+    @instrumented
+    async def iter_users(self, after_id=None, itersize=None, order_by='id', descending=False):
+        """Stream users through a server-side cursor, ordered by the database"""
+        query = f"SELECT * FROM users WHERE id > $1 ORDER BY {order_by_clause(order_by, self.columns, descending)}"
+        async with acquire() as conn:
+            async with conn.transaction():
+                async for row in conn.cursor(query, after_id if after_id is not None else 0,
+                                             prefetch=itersize or ITERSIZE):
+                    yield User._make(row)
+
+    @instrumented
+    async def find_by_user_code(self, user_code):
+        user = self.cache.get(str(user_code))
+        if user is not None:
+            return user
+        async with acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM users WHERE user_code = $1;", int(user_code))
+        if row is None:
+            return None
+        user = User._make(row)
+        self.cache.set(str(user_code), user)
+        return user
+
+    @instrumented
+    async def get_many(self, user_codes):
+        """Resolve many user codes at once: ``{user_code: row}``, None for unknown codes"""
+        codes = list(dict.fromkeys(int(code) for code in user_codes))
+        found, missing = split_cached(self.cache, codes)
+        if missing:
+            async with acquire() as conn:
+                rows = await conn.fetch("SELECT * FROM users WHERE user_code = ANY($1::integer[]);", missing)
+            for user in map(User._make, rows):
+                found[user.user_code] = user
+                self.cache.set(str(user.user_code), user)
+        return {code: found.get(code) for code in codes}
+
+    @instrumented
+    async def delete_user(self, user_code):
+        async with acquire() as conn:
+            status = await conn.execute("DELETE FROM users WHERE user_code = $1;", int(user_code))
+        self.cache.delete(str(user_code))
+        return bool(affected_rows(status))
+
+    @instrumented
+    async def update_user(self, user_code, name=None, email=None, phone=None):
+        self.validate_user_fields(name, email, phone, user_code)
+        query = ("""
+                 UPDATE users SET (name, email, phone) = ($1, $2, $3)
+                 WHERE user_code = $4;
+                 """)
+        async with acquire() as conn:
+            status = await conn.execute(query, name, email, phone, user_code)
+        if not affected_rows(status):
+            return None
+        self.cache.delete(str(user_code))
+        return True
@@ -1,17 +1,142 @@
 from Models.models import Book, User
 from Exceptions.exceptions import DuplicateError, LenOfPhoneError, EmailFormatError
+from Controllers.cache import LRUCache
+from Controllers.metrics import instrumented
+from Controllers.statements import execute_prepared
 from db_connection import get_connection
 from datetime import datetime
-import re, psycopg2
+from psycopg2 import errors, extensions
+import csv, io, os, re
 
+# rows fetched per round trip by the server-side cursors
+ITERSIZE = int(os.getenv('DB_ITERSIZE', '2000'))
+# codes sent per "= ANY(%s)" query by the batched lookups
+LOOKUP_CHUNK = int(os.getenv('DB_LOOKUP_CHUNK', '5000'))
 
-class BookController():
-    def __init__(self) -> None:
-        self.conn = get_connection()
-        if self.conn is not None:
-            self.cursor = self.conn.cursor()
+
+def order_by_clause(order_by, columns, descending=False):
+    # column names are checked against a whitelist before reaching the SQL
+    if isinstance(order_by, str):
+        order_by = (order_by, )
+    for column in order_by:
+        if column not in columns:
+            raise ValueError(f'Cannot order by "{column}"')
+    direction = ' DESC' if descending else ''
+    return ', '.join(f'{column}{direction}' for column in order_by)
+
+
+def keyset_order(order_by, unique_columns):
+    # pages continue after the last row shown, the ordering must identify rows
+    order_by = (order_by, ) if isinstance(order_by, str) else tuple(order_by)
+    return order_by if order_by[-1] in unique_columns else order_by + ('id', )
+
+
+def keyset_query(table, order_by, columns, descending=False, after=None):
+    """SELECT of the ``table`` rows following the row whose ``order_by`` values are ``after``"""
+    ordering = order_by_clause(order_by, columns, descending)
+    where = ''
+    if after is not None:
+        placeholders = ', '.join(['%s'] * len(order_by))
+        where = f"WHERE ({', '.join(order_by)}) {'<' if descending else '>'} ({placeholders}) "
+    return f"SELECT * FROM {table} {where}ORDER BY {ordering}"
+
+
+def page_query(table, order_by, columns, descending=False, after=None):
+    """``keyset_query`` limited to a page.
+
+    The LIMIT is the last parameter, after the values of ``after``.
+    """
+    return f"{keyset_query(table, order_by, columns, descending, after)} LIMIT %s"
+
+
+def iter_pages(connection, table, cursor_factory, columns, order_by, page_size, descending=False):
+    """Yield the rows of ``table`` ``page_size`` at a time, each page read in a transaction of its own.
+
+    The connection goes back to the pool before the rows of a page are
+    yielded, so the consumer can wait between pages (on a prompt, say)
+    without holding a snapshot or locks.
+    """
+    after = None
+    while True:
+        with connection() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                cursor.execute(page_query(table, order_by, columns, descending, after), (*(after or ()), page_size))
+                rows = cursor.fetchall()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after = tuple(getattr(rows[-1], column) for column in order_by)
+
+
+def record_cursor(record):
+    """psycopg2 cursor class returning its rows as ``record`` instances"""
+
+    class RecordCursor(extensions.cursor):
+
+        def fetchone(self):
+            row = super().fetchone()
+            return None if row is None else record._make(row)
+
+        def fetchmany(self, *args, **kwargs):
+            return list(map(record._make, super().fetchmany(*args, **kwargs)))
+
+        def fetchall(self):
+            return list(map(record._make, super().fetchall()))
+
+        def __iter__(self):
+            # the base cursor is its own iterator, so step its __next__ directly
+            return map(record._make, iter(super().__next__, None))
+
+    RecordCursor.__name__ = RecordCursor.__qualname__ = f'{record.__name__}Cursor'
+    return RecordCursor
+
+
+BookCursor = record_cursor(Book)
+UserCursor = record_cursor(User)
+
+
+def split_cached(cache, codes):
+    # rows already cached and the codes that still have to be queried
+    found = {}
+    missing = []
+    for code in codes:
+        row = cache.get(str(code))
+        if row is None:
+            missing.append(code)
         else:
-            raise Exception("Failed to establish database connection")
+            found[code] = row
+    return found, missing
+
+
+# fuzzy title/author search of BookController.search, the <% operator is
+# served by the pg_trgm GIN indexes on title and author
+SEARCH_QUERY = """
+    SELECT * FROM books
+    WHERE %(text)s <%% title OR %(text)s <%% author
+    ORDER BY greatest(word_similarity(%(text)s, title), word_similarity(%(text)s, author)) DESC, id
+    LIMIT %(limit)s;
+    """
+
+# expected type of each field of the rows given to the bulk loaders
+BOOK_FIELD_TYPES = (('title', str), ('author', str), ('year', (str, int)), ('genre', str), ('isbn_code', str))
+USER_FIELD_TYPES = (('name', str), ('email', str), ('phone', str), ('user_code', int))
+
+
+def validate_field_types(row, field_types):
+    # imported rows arrive as parsed, a JSON number or null where text is
+    # expected must reject the row instead of breaking the validators
+    for value, (field, expected) in zip(row, field_types):
+        if value is not None and not isinstance(value, expected):
+            raise TypeError(f'Not registered! The {field} field has an invalid value: {value!r}')
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BookValidation():
+    """Field validation shared by the sync and async book controllers"""
 
     def validate_empty_fields(self, title, author, year, genre, code):
         # validate if any field is empty
@@ -58,66 +183,212 @@ class BookController():
         self.validate_non_numeric_fields(title, author, genre)
         self.validate_year_publication(year)
 
-    def add_book(self, title, author, year, genre, code):
-        if self.search_by_book_code(code):
-            raise DuplicateError(code)
 
+class BookController(BookValidation):
+    columns = Book._fields
+    unique_columns = ('id', 'isbn_code')
+
+    def __init__(self) -> None:
+        # books found by ISBN, invalidated by add/update/delete_book
+        self.cache = LRUCache()
+        # fail fast if the database can't be reached; connections are then
+        # borrowed from the pool per operation
+        with self._connection():
+            pass
+
+    def _connection(self):
+        conn = get_connection()
+        if conn is None:
+            raise Exception("Failed to establish database connection")
+        return conn
+
+    @instrumented
+    def add_book(self, title, author, year, genre, code, upsert=False):
+        # the unique isbn_code constraint does the duplicate check in the same
+        # round trip; with upsert=True an existing book is updated in place
         self.validate_book_fields(title, author, year, genre, code)
-        query = "INSERT INTO books (title, author, year, genre, isbn_code) VALUES (%s, %s, %s, %s, %s);"
-        with self.conn:
-            with self.conn.cursor() as cursor:
-                cursor.execute(query, (title, author, year, genre, code,))
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                execute_prepared(cursor, 'upsert_book' if upsert else 'insert_book',
+                                 (title, author, year, genre, code))
+                inserted = cursor.fetchone()
+        if inserted is None:
+            raise DuplicateError(code)
+        self.cache.delete(str(code))
         return "Success! Book registered!"
-   
+
+    @instrumented
+    def bulk_add_books(self, books, batch_size=5000):
+        """Register many books in a single transaction.
+
+        ``books`` is an iterable of (title, author, year, genre, code) rows.
+        Rows are validated with the same rules as ``add_book``, duplicated
+        ISBNs are found with one query per batch and the survivors are loaded
+        with COPY. Returns a report with the ``accepted`` (position, code)
+        rows and the ``rejected`` (position, code, reason) rows.
+        """
+        report = {'accepted': [], 'rejected': []}
+        seen = set()
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                batch = []
+                for position, row in enumerate(books):
+                    batch.append((position, row))
+                    if len(batch) >= batch_size:
+                        self._load_books_batch(cursor, batch, seen, report)
+                        batch = []
+                if batch:
+                    self._load_books_batch(cursor, batch, seen, report)
+        return report
+
+    def _load_books_batch(self, cursor, batch, seen, report):
+        candidates = []
+        for position, row in batch:
+            code = row[4] if len(row) == 5 else None
+            try:
+                if code is None:
+                    raise ValueError('Not registered! Please, enter all fields.')
+                validate_field_types(row, BOOK_FIELD_TYPES)
+                self.validate_book_fields(*row)
+            except (ValueError, TypeError) as e:
+                report['rejected'].append((position, code, str(e)))
+                continue
+            if code in seen:
+                report['rejected'].append((position, code, str(DuplicateError(code))))
+                continue
+            seen.add(code)
+            candidates.append((position, tuple(row)))
+
+        if not candidates:
+            return
+        cursor.execute("SELECT isbn_code FROM books WHERE isbn_code = ANY(%s);",
+                       ([row[4] for _, row in candidates], ))
+        registered = {code for code, in cursor.fetchall()}
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        loaded = 0
+        for position, row in candidates:
+            code = row[4]
+            if code in registered:
+                report['rejected'].append((position, code, str(DuplicateError(code))))
+            else:
+                writer.writerow(row)
+                report['accepted'].append((position, code))
+                loaded += 1
+        if not loaded:
+            return
+        buffer.seek(0)
+        cursor.copy_expert("COPY books (title, author, year, genre, isbn_code) FROM STDIN WITH (FORMAT csv);", buffer)
+
+    @instrumented
     def list_all_books(self):
         query = "SELECT * FROM books"
-        with self.conn:
-            with self.conn.cursor() as cursor:
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=BookCursor) as cursor:
                 cursor.execute(query)
                 result = cursor.fetchall()
         return result if result else None
 
+    @instrumented
+    def iter_books(self, after=None, itersize=None, order_by='id', descending=False):
+        """Stream books through a server-side cursor.
+
+        Only ``itersize`` rows are held in memory at a time and the ordering
+        is done by the database. ``after`` skips the rows up to and including
+        the one with those values of ``keyset_order(order_by)``, so a stream
+        can be resumed in any order.
+        """
+        order_by = keyset_order(order_by, self.unique_columns)
+        query = keyset_query('books', order_by, self.columns, descending, after)
+        with self._connection() as conn:
+            with conn.cursor(name='iter_books', cursor_factory=BookCursor) as cursor:
+                cursor.itersize = itersize or ITERSIZE
+                cursor.execute(query, tuple(after or ()))
+                yield from cursor
+
+    @instrumented
+    def iter_books_by_page(self, page_size, order_by='id', descending=False):
+        """Yield books ``page_size`` at a time, keeping no transaction open between pages.
+
+        For consumers that pause between pages: ``iter_books`` holds its
+        transaction until it is exhausted or closed.
+        """
+        order_by = keyset_order(order_by, self.unique_columns)
+        yield from iter_pages(self._connection, 'books', BookCursor, self.columns, order_by, page_size, descending)
+
+    @instrumented
     def search_by_book_code(self, code):
-        query = "SELECT * FROM books WHERE isbn_code = %s"
-        with self.conn:
-            with self.conn.cursor() as cursor:
-                cursor.execute(query, (code, ))
+        result = self.cache.get(str(code))
+        if result is not None:
+            return result
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=BookCursor) as cursor:
+                execute_prepared(cursor, 'book_by_isbn', (code, ))
                 result = cursor.fetchone()
+        if result is not None:
+            self.cache.set(str(code), result)
+        return result
+
+    @instrumented
+    def search_by_book_codes(self, codes, chunk_size=None):
+        """Resolve many ISBNs: ``{isbn: row}``, None marking unknown codes.
+
+        Cached books are answered locally and the rest are fetched
+        ``chunk_size`` codes per query over a single connection.
+        """
+        codes = list(dict.fromkeys(str(code) for code in codes))
+        found, missing = split_cached(self.cache, codes)
+        if missing:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=BookCursor) as cursor:
+                    for chunk in chunked(missing, chunk_size or LOOKUP_CHUNK):
+                        execute_prepared(cursor, 'books_by_isbns', (chunk, ))
+                        for book in cursor.fetchall():
+                            found[book.isbn_code] = book
+                            self.cache.set(book.isbn_code, book)
+        return {code: found.get(code) for code in codes}
+
+    @instrumented
+    def search(self, text, limit=10):
+        """Top ``limit`` books whose title or author resemble ``text``.
+
+        Uses pg_trgm word similarity so partial and misspelled input still
+        match; the ``<%`` operator is served by the trigram GIN indexes.
+        """
+        text = (text or '').strip()
+        if not text:
+            return []
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=BookCursor) as cursor:
+                cursor.execute(SEARCH_QUERY, {'text': text, 'limit': limit})
+                result = cursor.fetchall()
         return result
-          
+
+    @instrumented
     def update_book(self, code, title=None, author=None, year=None, genre=None):
-        query = ("""
-                 UPDATE books SET (title, author, year, genre) = (%s, %s, %s, %s)
-                 WHERE isbn_code = %s;
-                 """)
-        book = self.search_by_book_code(code)
-        if book is None:
+        self.validate_book_fields(title, author, year, genre, code)
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                execute_prepared(cursor, 'update_book', (title, author, year, genre, code))
+                updated = cursor.rowcount
+        if not updated:
             return None
-        else:
-            self.validate_book_fields(title, author, year, genre, code)
-            with self.conn:
-                with self.conn.cursor() as cursor:
-                    cursor.execute(query, (title, author, year, genre, code, ))        
-            return True
+        self.cache.delete(str(code))
+        return True
 
+    @instrumented
     def delete_book(self, code):
-        query = "DELETE FROM books WHERE isbn_code = %s"
-        book = self.search_by_book_code(code)
-        if book:
-            with self.conn:
-                with self.conn.cursor() as cursor:
-                    cursor.execute(query, (code, ))
-            return True
-        return False
-
-
-class UserController():
-    def __init__(self) -> None:    
-        self.conn = get_connection()
-        if self.conn is not None:
-            self.cursor = self.conn.cursor()
-        else:
-            raise Exception("Failed to establish database connection")
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                execute_prepared(cursor, 'delete_book', (code, ))
+                deleted = cursor.rowcount
+        self.cache.delete(str(code))
+        return bool(deleted)
+
+
+class UserValidation():
+    """Field validation shared by the sync and async user controllers"""
 
     def validate_empty_fields(self, name, email, phone, user_code):
         if not name or not email or not phone or not user_code:
@@ -155,53 +426,178 @@ class UserController():
         self.validate_len_phone(phone)
         self.validate_email_format(email)
 
-    def register_user(self, name, email, phone, user_code):
-        if self.find_by_user_code(user_code):
+
+class UserController(UserValidation):
+    columns = User._fields
+    unique_columns = ('id', 'email', 'user_code')
+
+    def __init__(self) -> None:
+        # users found by code, invalidated by register/update/delete_user
+        self.cache = LRUCache()
+        with self._connection():
+            pass
+
+    def _connection(self):
+        conn = get_connection()
+        if conn is None:
+            raise Exception("Failed to establish database connection")
+        return conn
+
+    @instrumented
+    def register_user(self, name, email, phone, user_code, upsert=False):
+        self.validate_user_fields(name, email, phone, user_code)
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as cursor:
+                    execute_prepared(cursor, 'upsert_user' if upsert else 'insert_user', (name, email, phone, user_code))
+                    inserted = cursor.fetchone()
+        except errors.UniqueViolation:
+            # the upsert only resolves user code conflicts, the e-mail belongs to another user
+            raise DuplicateError(user_code, entity="User") from None
+        if inserted is None:
             raise DuplicateError(user_code, entity="User")
-        with self.conn:
-            with self.conn.cursor() as cursor:
-                self.validate_user_fields(name, email, phone, user_code)
-                query = "INSERT INTO users (name, email, phone, user_code) VALUES (%s, %s, %s, %s);"
-                cursor.execute(query, (name, email, phone, user_code, ))
+        self.cache.delete(str(user_code))
         return "Success! User registered."
 
+    @instrumented
+    def bulk_register_users(self, users, batch_size=5000):
+        """Register many users in a single transaction.
+
+        ``users`` is an iterable of (name, email, phone, user_code) rows,
+        validated like ``register_user``. Rows whose user code or e-mail is
+        already taken are rejected and the rest are loaded with COPY. Returns
+        the same accepted/rejected report as ``BookController.bulk_add_books``.
+        """
+        report = {'accepted': [], 'rejected': []}
+        seen_codes, seen_emails = set(), set()
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                batch = []
+                for position, row in enumerate(users):
+                    batch.append((position, row))
+                    if len(batch) >= batch_size:
+                        self._load_users_batch(cursor, batch, seen_codes, seen_emails, report)
+                        batch = []
+                if batch:
+                    self._load_users_batch(cursor, batch, seen_codes, seen_emails, report)
+        return report
+
+    def _load_users_batch(self, cursor, batch, seen_codes, seen_emails, report):
+        candidates = []
+        for position, row in batch:
+            user_code = row[3] if len(row) == 4 else None
+            try:
+                if user_code is None:
+                    raise ValueError('Not registered! Please, enter all fields')
+                validate_field_types(row, USER_FIELD_TYPES)
+                self.validate_user_fields(*row)
+            except (ValueError, TypeError, LenOfPhoneError, EmailFormatError) as e:
+                report['rejected'].append((position, user_code, str(e)))
+                continue
+            email = row[1]
+            if user_code in seen_codes or email in seen_emails:
+                report['rejected'].append((position, user_code, str(DuplicateError(user_code, entity="User"))))
+                continue
+            seen_codes.add(user_code)
+            seen_emails.add(email)
+            candidates.append((position, tuple(row)))
+
+        if not candidates:
+            return
+        cursor.execute("SELECT user_code, email FROM users WHERE user_code = ANY(%s) OR email = ANY(%s);",
+                       ([row[3] for _, row in candidates], [row[1] for _, row in candidates]))
+        registered_codes, registered_emails = set(), set()
+        for user_code, email in cursor.fetchall():
+            registered_codes.add(user_code)
+            registered_emails.add(email)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        loaded = 0
+        for position, row in candidates:
+            user_code = row[3]
+            if user_code in registered_codes or row[1] in registered_emails:
+                report['rejected'].append((position, user_code, str(DuplicateError(user_code, entity="User"))))
+            else:
+                writer.writerow(row)
+                report['accepted'].append((position, user_code))
+                loaded += 1
+        if not loaded:
+            return
+        buffer.seek(0)
+        cursor.copy_expert("COPY users (name, email, phone, user_code) FROM STDIN WITH (FORMAT csv);", buffer)
+
+    @instrumented
     def list_users(self):
         query = "SELECT * FROM users"
-        with self.conn:
-            with self.conn.cursor() as cursor:
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=UserCursor) as cursor:
                 cursor.execute(query, ())
                 result = cursor.fetchall()
         return result
         
+    @instrumented
+    def iter_users(self, after=None, itersize=None, order_by='id', descending=False):
+        """Stream users through a server-side cursor, ordered by the database, see ``iter_books``"""
+        order_by = keyset_order(order_by, self.unique_columns)
+        query = keyset_query('users', order_by, self.columns, descending, after)
+        with self._connection() as conn:
+            with conn.cursor(name='iter_users', cursor_factory=UserCursor) as cursor:
+                cursor.itersize = itersize or ITERSIZE
+                cursor.execute(query, tuple(after or ()))
+                yield from cursor
+
+    @instrumented
+    def iter_users_by_page(self, page_size, order_by='id', descending=False):
+        """Yield users ``page_size`` at a time, keeping no transaction open between pages"""
+        order_by = keyset_order(order_by, self.unique_columns)
+        yield from iter_pages(self._connection, 'users', UserCursor, self.columns, order_by, page_size, descending)
+
+    @instrumented
     def find_by_user_code(self, user_code):
-        query = "SELECT * FROM users WHERE user_code = %s;"
-        with self.conn:
-            with self.conn.cursor() as cursor:
-                cursor.execute(query, (user_code, ))
+        user = self.cache.get(str(user_code))
+        if user is not None:
+            return user
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=UserCursor) as cursor:
+                execute_prepared(cursor, 'user_by_code', (user_code, ))
                 user = cursor.fetchone()
+        if user is not None:
+            self.cache.set(str(user_code), user)
         return user
 
+    @instrumented
+    def find_by_user_codes(self, user_codes, chunk_size=None):
+        """Resolve many user codes: ``{user_code: row}``, None marking unknown codes"""
+        codes = list(dict.fromkeys(int(code) for code in user_codes))
+        found, missing = split_cached(self.cache, codes)
+        if missing:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=UserCursor) as cursor:
+                    for chunk in chunked(missing, chunk_size or LOOKUP_CHUNK):
+                        execute_prepared(cursor, 'users_by_codes', (chunk, ))
+                        for user in cursor.fetchall():
+                            found[user.user_code] = user
+                            self.cache.set(str(user.user_code), user)
+        return {code: found.get(code) for code in codes}
+
+    @instrumented
     def delete_user(self, user_code):
-        user = self.find_by_user_code(user_code)
-        if user:
-            query = "DELETE FROM users WHERE user_code = %s;"
-            with self.conn:
-                with self.conn.cursor() as cursor:
-                    cursor.execute(query, (user_code, ))
-            return True
-        return False
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                execute_prepared(cursor, 'delete_user', (user_code, ))
+                deleted = cursor.rowcount
+        self.cache.delete(str(user_code))
+        return bool(deleted)
 
+    @instrumented
     def update_user(self, user_code, name=None, email=None, phone=None):
-        user = self.find_by_user_code(user_code)
-        if user is None:
+        self.validate_user_fields(name, email, phone, user_code)
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                execute_prepared(cursor, 'update_user', (name, email, phone, user_code))
+                updated = cursor.rowcount
+        if not updated:
             return None
-        else:
-            self.validate_user_fields(name, email, phone, user_code)
-            query = ("""
-                 UPDATE users SET (name, email, phone) = (%s, %s, %s)
-                 WHERE user_code = %s;
-                 """)
-            with self.conn:
-                with self.conn.cursor() as cursor:
-                    cursor.execute(query, (name, email, phone, user_code))
-            return True
+        self.cache.delete(str(user_code))
+        return True
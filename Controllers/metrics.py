@@ -0,0 +1,193 @@
+from collections import deque
+from functools import wraps
+import inspect, json, os, threading, time
+
+# latencies kept per method to compute the percentiles
+METRICS_SAMPLES = int(os.getenv('CONTROLLER_METRICS_SAMPLES', '10000'))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def count_rows(result):
+    # lists of rows, a single row, "not found", the bulk load report or a
+    # {key: row} lookup
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        return 1
+    if isinstance(result, dict) and 'accepted' in result:
+        return len(result['accepted'])
+    if isinstance(result, dict):
+        return sum(row is not None for row in result.values())
+    return 0
+
+
+def percentile(samples, quantile):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+class MethodMetrics():
+    """Counters and latency samples of a single controller method"""
+
+    def __init__(self, samples=METRICS_SAMPLES) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_time = 0.0
+        self.latencies = deque(maxlen=samples)
+
+    def snapshot(self):
+        snapshot = {'calls': self.calls, 'errors': self.errors, 'rows': self.rows,
+                    'total_seconds': self.total_time}
+        for quantile in QUANTILES:
+            snapshot[f'p{int(quantile * 100)}'] = percentile(self.latencies, quantile)
+        return snapshot
+
+
+class MetricsRegistry():
+    """Per method call counts, errors, rows and latencies of the controllers.
+
+    Disabled by default so the decorated methods only pay a flag check; set
+    CONTROLLER_METRICS=1 or call enable() to start recording.
+    """
+
+    def __init__(self, enabled=False, samples=METRICS_SAMPLES) -> None:
+        self.enabled = enabled
+        self.samples = samples
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+    def record(self, name, duration, rows=0, error=False):
+        with self._lock:
+            metrics = self._methods.get(name)
+            if metrics is None:
+                metrics = self._methods[name] = MethodMetrics(self.samples)
+            metrics.calls += 1
+            metrics.errors += error
+            metrics.rows += rows
+            metrics.total_time += duration
+            metrics.latencies.append(duration)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: metrics.snapshot() for name, metrics in sorted(self._methods.items())}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+        for metric, key, help_text in (('calls_total', 'calls', 'Controller method calls.'),
+                                       ('errors_total', 'errors', 'Controller method calls that raised.'),
+                                       ('rows_total', 'rows', 'Rows returned or written by controller methods.')):
+            lines.append(f'# HELP library_controller_{metric} {help_text}')
+            lines.append(f'# TYPE library_controller_{metric} counter')
+            for name, values in snapshot.items():
+                lines.append(f'library_controller_{metric}{{method="{name}"}} {values[key]}')
+
+        lines.append('# HELP library_controller_latency_seconds Controller method latency.')
+        lines.append('# TYPE library_controller_latency_seconds summary')
+        for name, values in snapshot.items():
+            for quantile in QUANTILES:
+                value = values[f'p{int(quantile * 100)}']
+                lines.append(f'library_controller_latency_seconds{{method="{name}",quantile="{quantile}"}} {value}')
+            lines.append(f'library_controller_latency_seconds_sum{{method="{name}"}} {values["total_seconds"]}')
+            lines.append(f'library_controller_latency_seconds_count{{method="{name}"}} {values["calls"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(enabled=os.getenv('CONTROLLER_METRICS', '') == '1')
+
+
+def instrumented(method):
+    """Records the calls of a controller method in the metrics registry.
+
+    Generator methods are timed until exhausted or closed and report the
+    rows they yielded; coroutines are timed until awaited.
+    """
+    name = method.__qualname__
+
+    if inspect.isasyncgenfunction(method):
+        @wraps(method)
+        async def async_generator_wrapper(*args, **kwargs):
+            # closed explicitly so an early break releases the connection now
+            # rather than when the event loop finalizes the generator
+            rows_iter = method(*args, **kwargs)
+            started = time.perf_counter()
+            rows = 0
+            error = False
+            try:
+                async for row in rows_iter:
+                    rows += 1
+                    yield row
+            except Exception:
+                error = True
+                raise
+            finally:
+                await rows_iter.aclose()
+                if registry.enabled:
+                    registry.record(name, time.perf_counter() - started, rows, error)
+        return async_generator_wrapper
+
+    if inspect.iscoroutinefunction(method):
+        @wraps(method)
+        async def coroutine_wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return await method(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = await method(*args, **kwargs)
+            except Exception:
+                registry.record(name, time.perf_counter() - started, error=True)
+                raise
+            registry.record(name, time.perf_counter() - started, count_rows(result))
+            return result
+        return coroutine_wrapper
+
+    if inspect.isgeneratorfunction(method):
+        @wraps(method)
+        def generator_wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return (yield from method(*args, **kwargs))
+            started = time.perf_counter()
+            rows = 0
+            error = False
+            try:
+                for row in method(*args, **kwargs):
+                    rows += 1
+                    yield row
+            except Exception:
+                error = True
+                raise
+            finally:
+                registry.record(name, time.perf_counter() - started, rows, error)
+        return generator_wrapper
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if not registry.enabled:
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            registry.record(name, time.perf_counter() - started, error=True)
+            raise
+        registry.record(name, time.perf_counter() - started, count_rows(result))
+        return result
+    return wrapper
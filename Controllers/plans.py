@@ -0,0 +1,121 @@
+"""Checks that the hot controller queries are planned on an index.
+
+    python -m Controllers.plans
+    python -m Controllers.plans --create-indexes
+
+Every query below is EXPLAINed with sequential scans disabled, and the ordered
+ones with sorts disabled too: the planner only falls back to them when no
+index can serve the query, so a Seq Scan or Sort node left in the plan means
+an index is missing, whatever the size of the tables. Nothing is executed and
+the transaction is rolled back.
+
+--create-indexes first builds the indexes of INDEXES; CONCURRENTLY keeps the
+tables writable meanwhile.
+"""
+from Controllers.controllers import SEARCH_QUERY, page_query
+from Controllers.statements import STATEMENTS, execute_statement, prepare
+from Models.models import Book, User
+from db_connection import get_connection
+from query_plans import plan_problems
+import argparse, psycopg2, sys
+
+# indexes the hot queries need besides the UNIQUE ones on isbn_code, email
+# and user_code; a build that fails leaves an INVALID index to DROP before retrying
+INDEXES = [
+    # the book listing of the menu, see Views.views.show_books
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS books_listing_idx ON books (title, author, year, genre, isbn_code)",
+    # the <% operators of SEARCH_QUERY; creating the extension needs the
+    # CREATE privilege on the database
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS books_title_trgm_idx ON books USING gin (title gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS books_author_trgm_idx ON books USING gin (author gin_trgm_ops)",
+]
+
+# ordering of the menu's book listing and the last row of a sample page
+BOOK_LISTING = ('title', 'author', 'year', 'genre', 'isbn_code')
+BOOK_LISTING_AFTER = ('Title', 'Author', 1990, 'Genre', '9780000000000')
+
+# (name, statement, sample parameters, ordered); statement is the name of a
+# prepared statement of Controllers.statements or the SQL itself
+HOT_QUERIES = [
+    ('book_by_isbn', 'book_by_isbn', ('9780000000000', ), False),
+    ('books_by_isbns', 'books_by_isbns', (['9780000000000', '9780000000001'], ), False),
+    ('update_book', 'update_book', ('Title', 'Author', 1990, 'Genre', '9780000000000'), False),
+    ('delete_book', 'delete_book', ('9780000000000', ), False),
+    ('user_by_code', 'user_by_code', (1000, ), False),
+    ('users_by_codes', 'users_by_codes', ([1000, 1001], ), False),
+    ('update_user', 'update_user', ('Name', 'name@example.com', '11999994444', 1000), False),
+    ('delete_user', 'delete_user', (1000, ), False),
+    ('book_listing', page_query('books', BOOK_LISTING, Book._fields, True, BOOK_LISTING_AFTER),
+     (*BOOK_LISTING_AFTER, 20), True),
+    ('user_listing', page_query('users', ('user_code', ), User._fields, True, (1000, )), (1000, 20), True),
+    # ordered by similarity, which no index holds: only the scan is checked
+    ('search', SEARCH_QUERY, {'text': 'machado', 'limit': 10}, False),
+]
+
+
+def explain(cursor, statement, params):
+    if statement in STATEMENTS:
+        prepare(cursor, statement)
+        statement = execute_statement(statement, params)
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", params)
+    return cursor.fetchone()[0][0]['Plan']
+
+
+def connection():
+    conn = get_connection()
+    if conn is None:
+        raise Exception("Failed to establish database connection")
+    return conn
+
+
+def check_plans(queries=HOT_QUERIES):
+    """``{name: problems}`` of the queries whose plan doesn't rely on indexes only"""
+    failures = {}
+    with connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                for name, statement, params, ordered in queries:
+                    cursor.execute(f"SET LOCAL enable_sort = {'off' if ordered else 'on'}")
+                    # a query that can't be planned (pg_trgm missing, say) fails alone
+                    cursor.execute("SAVEPOINT plan")
+                    try:
+                        problems = plan_problems(explain(cursor, statement, params), ordered)
+                    except psycopg2.Error as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT plan")
+                        problems = [f"not planned: {str(e).splitlines()[0]}"]
+                    if problems:
+                        failures[name] = problems
+        finally:
+            conn.rollback()
+    return failures
+
+
+def create_indexes(indexes=INDEXES):
+    with connection() as conn:
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for statement in indexes:
+                    cursor.execute(statement)
+        finally:
+            conn.autocommit = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='Controllers.plans', description='Check the plans of the hot queries.')
+    parser.add_argument('--create-indexes', action='store_true', help='build the missing indexes first')
+    args = parser.parse_args(argv)
+
+    if args.create_indexes:
+        create_indexes()
+    failures = check_plans()
+    for name, *_ in HOT_QUERIES:
+        print(f"{name}: {'; '.join(failures[name]) if name in failures else 'ok'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Hot controller statements, prepared once per pooled connection.
+
+Postgres parses and plans a prepared statement once per session; later
+calls only send ``EXECUTE name (params)``. Parameters are ``$n`` markers
+whose types are inferred from the columns they are compared to.
+"""
+
+STATEMENTS = {
+    'book_by_isbn': "SELECT * FROM books WHERE isbn_code = $1",
+    'books_by_isbns': "SELECT * FROM books WHERE isbn_code = ANY($1)",
+    'insert_book': """
+        INSERT INTO books (title, author, year, genre, isbn_code) VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (isbn_code) DO NOTHING
+        RETURNING id""",
+    'upsert_book': """
+        INSERT INTO books (title, author, year, genre, isbn_code) VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (isbn_code) DO UPDATE
+        SET (title, author, year, genre) = (EXCLUDED.title, EXCLUDED.author, EXCLUDED.year, EXCLUDED.genre)
+        RETURNING id""",
+    'update_book': "UPDATE books SET (title, author, year, genre) = ($1, $2, $3, $4) WHERE isbn_code = $5",
+    'delete_book': "DELETE FROM books WHERE isbn_code = $1",
+    'user_by_code': "SELECT * FROM users WHERE user_code = $1",
+    'users_by_codes': "SELECT * FROM users WHERE user_code = ANY($1)",
+    # no conflict target: a taken e-mail is a duplicate as much as a taken user code
+    'insert_user': """
+        INSERT INTO users (name, email, phone, user_code) VALUES ($1, $2, $3, $4)
+        ON CONFLICT DO NOTHING
+        RETURNING id""",
+    'upsert_user': """
+        INSERT INTO users (name, email, phone, user_code) VALUES ($1, $2, $3, $4)
+        ON CONFLICT (user_code) DO UPDATE
+        SET (name, email, phone) = (EXCLUDED.name, EXCLUDED.email, EXCLUDED.phone)
+        RETURNING id""",
+    'update_user': "UPDATE users SET (name, email, phone) = ($1, $2, $3) WHERE user_code = $4",
+    'delete_user': "DELETE FROM users WHERE user_code = $1",
+}
+
+
+def prepare(cursor, name):
+    """Prepare the registered statement ``name`` unless this connection already has"""
+    prepared = cursor.connection.prepared
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {STATEMENTS[name]}")
+        prepared.add(name)
+
+
+def execute_statement(name, params):
+    # the EXECUTE of ``name``, with a placeholder per parameter
+    return f"EXECUTE {name} ({', '.join(['%s'] * len(params))})"
+
+
+def execute_prepared(cursor, name, params):
+    """Run the registered statement ``name``, preparing it first if this connection hasn't yet"""
+    prepare(cursor, name)
+    cursor.execute(execute_statement(name, params), params)
@@ -21,3 +21,21 @@ class EmailFormatError(Exception):
         self.email = email
         self.message = f"{self.email} is not a valid email"
         super().__init__(self.message)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled database connection becomes available in time"""
+
+    def __init__(self, maxconn, timeout):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.message = f"All {self.maxconn} database connections are busy, gave up after {self.timeout} seconds."
+        super().__init__(self.message)
+
+
+class PoolClosedError(Exception):
+    """Raised when a connection is requested from a closed pool"""
+
+    def __init__(self):
+        self.message = "The database connection pool is closed."
+        super().__init__(self.message)
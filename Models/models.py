@@ -1,21 +1,30 @@
-class Book():
-    def __init__(self, title: str, author: str, year: int, genre: str, isbn_code: str) -> None:
-        self.title = title
-        self.author = author
-        self.year = year
-        self.genre = genre
-        self.isbn_code = isbn_code
-    
+from typing import NamedTuple
+
+
+class Book(NamedTuple):
+    """Row of the books table, as returned by BookController.
+
+    Being a tuple it is immutable and carries no per-instance ``__dict__``,
+    so it costs the same memory as the raw row while allowing access by name.
+    """
+    id: int
+    title: str
+    author: str
+    year: int
+    genre: str
+    isbn_code: str
+
     def show_info(self):
         return f' ISBN code: {self.isbn_code} | Title: {self.title} | Author: {self.author} | Publication Year: {self.year} | Genre: {self.genre}'
-            
 
-class User():
-    def __init__(self, name: str, email: str, phone: str, user_code: int) -> None:
-        self.name = name
-        self.email = email
-        self.phone = phone
-        self.user_code = user_code
+
+class User(NamedTuple):
+    """Row of the users table, as returned by UserController"""
+    id: int
+    name: str
+    email: str
+    phone: str
+    user_code: int
 
     def show_info(self):
         return f' User code: {self.user_code} | Name: {self.name} | E-mail: {self.email} | Phone: {self.phone}'
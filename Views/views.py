@@ -2,11 +2,35 @@ from Controllers.controllers import BookController, UserController
 from Exceptions.exceptions import DuplicateError, EmailFormatError, LenOfPhoneError
 from prompt_toolkit import prompt
 from tabulate import tabulate
-import psycopg2
+import itertools, psycopg2
 
 book_controller = BookController()
 user_controller = UserController()
 
+PAGE_SIZE = 20
+
+
+def book_columns(book):
+    return book.title, book.author, book.year, book.genre, book.isbn_code
+
+
+def user_columns(user):
+    return user.user_code, user.name, user.email, user.phone
+
+
+def paginate(rows, headers, page_size=PAGE_SIZE):
+    # render the rows one page at a time, fetching the next page only when asked;
+    # rows come from iter_*_by_page so no transaction stays open at the prompt
+    shown = 0
+    page = list(itertools.islice(rows, page_size))
+    while page:
+        print(tabulate(page, showindex=False, headers=headers, tablefmt="grid"))
+        shown += len(page)
+        page = list(itertools.islice(rows, page_size))
+        if page and input(f'{shown} shown. Press Enter to see more or type "q" to stop: ').strip().lower() == 'q':
+            break
+    return shown
+
 # BOOK VIEWS
 
 def show_menu():
@@ -23,7 +47,8 @@ def show_menu():
               f'- To list all books type 2.\n'
               f'- To search for a book type 3.\n'
               f'- To update a book type 4.\n'
-              f'- To delete a book type 5.')
+              f'- To delete a book type 5.\n'
+              f'- To search by title or author type 6.')
         print('-' * 85)
         choice = input()
         print('-' * 85)
@@ -67,13 +92,14 @@ def book_register(controller):
 
 def show_books(controller):
     try:
-        books = controller.list_all_books()
-        if books:
-            books_without_id = [row[1:] for row in books]
+        books = controller.iter_books_by_page(PAGE_SIZE, order_by=('title', 'author', 'year', 'genre', 'isbn_code'),
+                                             descending=True)
+        try:
             headers = ['Title', 'Author', 'Publication year', 'Genre', 'ISBN Code']
-            print(tabulate(sorted(books_without_id, reverse=True), showindex=False, headers=headers, tablefmt="grid"))
-        else:
-            print('There are no books registered yet')
+            if not paginate((book_columns(book) for book in books), headers):
+                print('There are no books registered yet')
+        finally:
+            books.close()
     except psycopg2.Error as db_error:  
         print(f"Database error: {db_error}")
     except ValueError as e:
@@ -87,9 +113,8 @@ def search_book(controller):
         print('-' * 85)
         book = controller.search_by_book_code(ipt_code)
         if book:
-            book_without_id = [book[1:]]
             headers = ['Title', 'Author', 'Publication year', 'Genre', 'ISBN Code']
-            print(tabulate(book_without_id, headers=headers, tablefmt="grid"))
+            print(tabulate([book_columns(book)], headers=headers, tablefmt="grid"))
         else:
             print('Book not found')
     except psycopg2.Error as db_error:  
@@ -99,6 +124,21 @@ def search_book(controller):
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
+def search_book_by_text(controller):
+    try:
+        text = input('Enter part of the title or author: ')
+        print('-' * 85)
+        books = controller.search(text)
+        if books:
+            headers = ['Title', 'Author', 'Publication year', 'Genre', 'ISBN Code']
+            print(tabulate([book_columns(book) for book in books], headers=headers, tablefmt="grid"))
+        else:
+            print('No similar books found')
+    except psycopg2.Error as db_error:
+        print(f"Database error: {db_error}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
 def delete_book(controller):
     try:
         ipt_code = input('Enter the ISBN code of the book you want to delete: ')
@@ -121,10 +161,10 @@ def update_book(controller):
         print('-' * 85)
         book = controller.search_by_book_code(ipt_code)
         if book:
-                new_title = prompt("Book Title: ", default=book[1]).strip() or book[1]
-                new_author = prompt("Author: ", default=book[2]).strip() or book[2]
-                new_year = prompt("Publication Year: ", default=str(book[3])).strip() or book[3]
-                new_genre = prompt("Literary genre: ", default=book[4]).strip() or book[4]
+                new_title = prompt("Book Title: ", default=book.title).strip() or book.title
+                new_author = prompt("Author: ", default=book.author).strip() or book.author
+                new_year = prompt("Publication Year: ", default=str(book.year)).strip() or book.year
+                new_genre = prompt("Literary genre: ", default=book.genre).strip() or book.genre
                 print('-' * 85)
                 controller.update_book(ipt_code, new_title, new_author, new_year, new_genre)
                 print('Book updated')
@@ -169,13 +209,13 @@ def user_register(controller):
 
 def show_users(controller):
     try:
-        users = controller.list_users()
-        if users:
-            users_reordered = [(row[4], row[1], row[2], row[3]) for row in users]
+        users = controller.iter_users_by_page(PAGE_SIZE, order_by='user_code', descending=True)
+        try:
             headers = ['User Code', 'Name', 'E-mail', 'Phone']
-            print(tabulate(sorted(users_reordered, reverse=True), showindex=False, headers=headers, tablefmt="grid"))
-        else:
-            print('There are no users registered yet')
+            if not paginate((user_columns(user) for user in users), headers):
+                print('There are no users registered yet')
+        finally:
+            users.close()
     except psycopg2.Error as db_error:  
         print(f"Database error: {db_error}")
     except Exception as e:
@@ -190,10 +230,8 @@ def search_user(controller):
         else:
             user = controller.find_by_user_code(ipt_code)
             if user:
-                user = [user]
-                user_reordered = [(row[4], row[1], row[2], row[3]) for row in user]
                 headers = ['User Code', 'Name', 'E-mail', 'Phone']
-                print(tabulate(sorted(user_reordered, reverse=True), showindex=False, headers=headers, tablefmt="grid"))
+                print(tabulate([user_columns(user)], showindex=False, headers=headers, tablefmt="grid"))
             else:
                 print('User not found')
     except psycopg2.Error as db_error:
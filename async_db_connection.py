@@ -0,0 +1,66 @@
+from db_connection import get_db_config, get_pool_config
+from Exceptions.exceptions import PoolTimeoutError
+from contextlib import asynccontextmanager
+import asyncio, asyncpg
+
+# asyncpg pools belong to the event loop that created them, so each loop
+# keeps its own as an attribute; the value is the task creating it so
+# concurrent first callers share a single pool. A registry keyed by loop
+# would keep every loop alive, as the pool and its task refer back to it.
+POOL_ATTRIBUTE = '_library_async_pool'
+
+
+async def _create_pool():
+    config = get_pool_config()
+    db = get_db_config()
+    return await asyncpg.create_pool(
+        database=db['dbname'], user=db['user'], password=db['password'], host=db['host'], port=int(db['port']),
+        min_size=config['minconn'], max_size=config['maxconn'],
+        max_inactive_connection_lifetime=config['idle_timeout'],
+    )
+
+
+def _forget_pool(loop, task):
+    if getattr(loop, POOL_ATTRIBUTE, None) is task:
+        delattr(loop, POOL_ATTRIBUTE)
+
+
+async def get_async_pool():
+    loop = asyncio.get_running_loop()
+    task = getattr(loop, POOL_ATTRIBUTE, None)
+    if task is None:
+        task = loop.create_task(_create_pool())
+        setattr(loop, POOL_ATTRIBUTE, task)
+    try:
+        return await task
+    except Exception:
+        _forget_pool(loop, task)
+        raise
+
+
+async def close_async_pool():
+    loop = asyncio.get_running_loop()
+    task = getattr(loop, POOL_ATTRIBUTE, None)
+    if task is not None:
+        _forget_pool(loop, task)
+        pool = await task
+        await pool.close()
+
+
+@asynccontextmanager
+async def acquire():
+    """Borrow a connection of the running loop's pool for one operation.
+
+    Waits at most DB_POOL_TIMEOUT seconds for a free connection, so at most
+    DB_POOL_MAX queries run at once however many coroutines are waiting.
+    """
+    pool = await get_async_pool()
+    timeout = get_pool_config()['checkout_timeout']
+    try:
+        conn = await pool.acquire(timeout=timeout)
+    except asyncio.TimeoutError:
+        raise PoolTimeoutError(pool.get_max_size(), timeout)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
@@ -0,0 +1,8 @@
+"""Benchmarks of the controller and web layers.
+
+    python -m benchmarks.run --sizes 10000 100000 --output report.json
+    python -m benchmarks.compare before.json after.json
+
+The runs use their own databases (``library_bench`` for the controllers and
+``library_web_bench`` for the site) so seeding never touches real data.
+"""
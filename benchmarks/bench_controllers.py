@@ -0,0 +1,40 @@
+from benchmarks.seed import ISBN_START, ISBN_WRITES, USER_CODE_START
+from benchmarks.timing import measure, peak_memory
+from Controllers.controllers import BookController, UserController
+import random
+
+
+def run(size, ops, list_runs=3):
+    """Controller benchmarks against a database seeded with ``size`` rows"""
+    books = BookController()
+    users = UserController()
+    rng = random.Random(size)
+    seeded_isbns = [str(ISBN_START + rng.randrange(size)) for _ in range(ops + 1)]
+    seeded_codes = [USER_CODE_START + rng.randrange(size) for _ in range(ops + 1)]
+    new_isbns = [str(ISBN_WRITES + n) for n in range(ops + 1)]
+
+    def uncached_lookup(i):
+        books.cache.clear()
+        books.search_by_book_code(seeded_isbns[i])
+
+    def uncached_user_lookup(i):
+        users.cache.clear()
+        users.find_by_user_code(seeded_codes[i])
+
+    results = {
+        'add_book': measure(lambda i: books.add_book('Bench Title', 'Bench Author', '2001', 'Bench',
+                                                     new_isbns[i]), ops),
+        'search_by_book_code': measure(uncached_lookup, ops),
+        'search_by_book_code_cached': measure(lambda i: books.search_by_book_code(seeded_isbns[0]), ops),
+        'update_book': measure(lambda i: books.update_book(new_isbns[i], 'Bench Title 2', 'Bench Author', '2002',
+                                                           'Bench'), ops),
+        'delete_book': measure(lambda i: books.delete_book(new_isbns[i]), ops),
+        'find_by_user_code': measure(uncached_user_lookup, ops),
+        'list_all_books': measure(lambda i: books.list_all_books(), list_runs),
+        'list_users': measure(lambda i: users.list_users(), list_runs),
+        'iter_books': measure(lambda i: sum(1 for _ in books.iter_books()), list_runs),
+    }
+    results['list_all_books']['peak_bytes'] = peak_memory(books.list_all_books)
+    results['list_users']['peak_bytes'] = peak_memory(users.list_users)
+    results['iter_books']['peak_bytes'] = peak_memory(lambda: sum(1 for _ in books.iter_books()))
+    return results
@@ -0,0 +1,47 @@
+from Models.models import Book
+import gc, time, tracemalloc
+
+
+class PlainBook():
+    # the previous Models.models.Book layout: one __dict__ per instance
+    def __init__(self, id, title, author, year, genre, isbn_code):
+        self.id = id
+        self.title = title
+        self.author = author
+        self.year = year
+        self.genre = genre
+        self.isbn_code = isbn_code
+
+
+REPRESENTATIONS = {
+    'tuple': tuple,
+    'record': Book._make,
+    'dict': lambda values: dict(zip(Book._fields, values)),
+    'plain_class': lambda values: PlainBook(*values),
+}
+
+
+def measure_rows(make, size):
+    # field values are shared between rows so only the containers are counted
+    values = [[n, 'Title', 'Author', 1990, 'Genre', '9780000000000'] for n in range(size)]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        rows = [make(row) for row in values]
+        elapsed = time.perf_counter() - started
+        allocated = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del rows
+    return {
+        # with tracemalloc on, only comparable between representations
+        'build_ms': round(elapsed * 1000, 3),
+        'bytes_per_row': round(allocated / size, 1),
+        'mb_per_million_rows': round(allocated / size * 1_000_000 / 2 ** 20, 1),
+    }
+
+
+def run(size):
+    """Memory of ``size`` book rows held as each candidate representation"""
+    return {name: measure_rows(make, size) for name, make in REPRESENTATIONS.items()}
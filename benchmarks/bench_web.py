@@ -0,0 +1,70 @@
+from benchmarks.seed import GENRES, ISBN_START
+from benchmarks.timing import measure
+import logging, os, random, re
+
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+
+def setup():
+    """Configures Django against a database of its own, kept between runs"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_management_web.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    # kept apart from test_library_web, which manage.py test recreates
+    connection.settings_dict['TEST']['NAME'] = 'library_web_bench'
+    logging.getLogger('library_management_web.performance').setLevel(logging.WARNING)
+    connection.creation.create_test_db(verbosity=0, keepdb=True, serialize=False)
+
+
+def seed(size, reseed=False, batch_size=10000):
+    from django.db import connection
+    from library.models import Book
+
+    if not reseed and Book.objects.count() == size:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('TRUNCATE library_book, library_loan RESTART IDENTITY CASCADE;')
+    for start in range(0, size, batch_size):
+        Book.objects.bulk_create(
+            Book(title=f'Book {n:07d}', author=f'Author {n % 5000}', year=str(1900 + n % 120),
+                 genre=GENRES[n % len(GENRES)], isbn=str(ISBN_START + n))
+            for n in range(start, min(size, start + batch_size)))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE library_book;')
+    return True
+
+
+def run(size, ops):
+    """View latency through the test client, with the queries each view ran"""
+    from django.test import Client
+    from django.urls import reverse
+    from library.models import Book
+
+    client = Client()
+    rng = random.Random(size)
+    ids = list(Book.objects.order_by('?').values_list('pk', flat=True)[:ops + 1])
+    pages = {
+        'home': lambda i: reverse('library:home'),
+        'books': lambda i: reverse('library:books'),
+        'book_detail': lambda i: reverse('library:book_detail', args=[ids[i % len(ids)]]),
+        'book_register': lambda i: reverse('library:book_register'),
+        'search': lambda i: f"{reverse('library:search')}?q=author+{rng.randrange(5000)}",
+    }
+
+    results = {}
+    for name, url in pages.items():
+        last = {}
+
+        def get(i):
+            response = client.get(url(i))
+            if response.status_code != 200:
+                raise RuntimeError(f'{name} answered {response.status_code}')
+            last['response'] = response
+        results[name] = measure(get, ops)
+        match = QUERY_COUNT.search(last['response'].get('Server-Timing', ''))
+        results[name]['queries'] = int(match.group(1)) if match else None
+    return results
@@ -0,0 +1,44 @@
+"""Side by side view of two benchmark reports.
+
+    python -m benchmarks.compare before.json after.json
+"""
+from tabulate import tabulate
+import argparse, json, sys
+
+METRICS = ('p50_ms', 'p95_ms', 'peak_bytes', 'bytes_per_row', 'queries')
+
+
+def compare(before, after):
+    rows = []
+    for size, sections in after['sizes'].items():
+        for section, benchmarks in sections.items():
+            for name, values in benchmarks.items():
+                old = before['sizes'].get(size, {}).get(section, {}).get(name, {})
+                for metric in METRICS:
+                    if values.get(metric) is None:
+                        continue
+                    new_value, old_value = values[metric], old.get(metric)
+                    change = (f'{(new_value - old_value) / old_value:+.1%}'
+                              if old_value else '')
+                    rows.append([size, section, name, metric, old_value, new_value, change])
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.compare', description='Compare two benchmark reports.')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args(argv)
+
+    with open(args.before, encoding='utf-8') as file:
+        before = json.load(file)
+    with open(args.after, encoding='utf-8') as file:
+        after = json.load(file)
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(tabulate(compare(before, after), headers=['size', 'section', 'benchmark', 'metric', 'before', 'after',
+                                                    'change']))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Seeds the benchmark databases at each size and writes a JSON report.
+
+    python -m benchmarks.run --sizes 10000 100000 1000000 --output report.json
+"""
+from benchmarks import bench_controllers, bench_records, bench_web, seed
+from datetime import datetime, timezone
+import argparse, json, os, platform, subprocess, sys, time
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.run', description='Benchmark the controllers and the site.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000], help='books and users seeded per run')
+    parser.add_argument('--ops', type=int, default=200, help='timed calls per CRUD operation and view')
+    parser.add_argument('--list-runs', type=int, default=3, help='timed calls of the full listings')
+    parser.add_argument('--database', default='library_bench', help='database used by the controllers')
+    parser.add_argument('--reseed', action='store_true', help='reload the data even if the sizes match')
+    parser.add_argument('--skip-controllers', action='store_true')
+    parser.add_argument('--skip-web', action='store_true')
+    parser.add_argument('--output', default='-', help='report file, - for stdout')
+    args = parser.parse_args(argv)
+
+    # the controllers read their connection settings on first use
+    os.environ['DB_NAME'] = args.database
+    from db_connection import get_connection
+    if not args.skip_controllers:
+        seed.create_database(args.database)
+    if not args.skip_web:
+        bench_web.setup()
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'ops': args.ops,
+        'sizes': {},
+    }
+    for size in args.sizes:
+        results = report['sizes'][str(size)] = {}
+        results['records'] = bench_records.run(size)
+        if not args.skip_controllers:
+            started = time.monotonic()
+            with get_connection() as conn:
+                seeded = seed.seed(conn, size, args.reseed)
+            if seeded:
+                print(f'{size}: controller tables seeded in {time.monotonic() - started:.1f}s', file=sys.stderr)
+            results['controllers'] = bench_controllers.run(size, args.ops, args.list_runs)
+        if not args.skip_web:
+            started = time.monotonic()
+            if bench_web.seed(size, args.reseed):
+                print(f'{size}: site books seeded in {time.monotonic() - started:.1f}s', file=sys.stderr)
+            results['views'] = bench_web.run(size, args.ops)
+        print(f'{size}: done', file=sys.stderr)
+
+    dump = json.dumps(report, indent=2, sort_keys=True) + '\n'
+    if args.output == '-':
+        sys.stdout.write(dump)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(dump)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+from db_connection import get_db_config
+import io, itertools, psycopg2
+from psycopg2 import sql
+
+GENRES = ('Romance', 'Fantasia', 'Biografia', 'Poesia', 'Suspense', 'Ficção Científica')
+# first ISBN of the seeded books, the benchmarks write above ISBN_WRITES
+ISBN_START = 9780000000000
+ISBN_WRITES = 9790000000000
+USER_CODE_START = 100000
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS books (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        author VARCHAR(255) NOT NULL,
+        year INTEGER NOT NULL,
+        genre VARCHAR(100) NOT NULL,
+        isbn_code VARCHAR(20) UNIQUE NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) UNIQUE NOT NULL,
+        phone VARCHAR(15) NOT NULL,
+        user_code INTEGER UNIQUE NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS books_listing_idx ON books (title, author, year, genre, isbn_code);
+"""
+
+
+def book_row(n):
+    return (f'Book {n:07d}', f'Author {n % 5000}', 1900 + n % 120, GENRES[n % len(GENRES)], str(ISBN_START + n))
+
+
+def user_row(n):
+    return (f'User {n:07d}', f'user{n}@bench.test', f'11{n:09d}', USER_CODE_START + n)
+
+
+def create_database(dbname):
+    config = dict(get_db_config(), dbname='postgres')
+    conn = psycopg2.connect(**config)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_database WHERE datname = %s;', (dbname, ))
+            if cursor.fetchone() is None:
+                cursor.execute(sql.SQL('CREATE DATABASE {};').format(sql.Identifier(dbname)))
+    finally:
+        conn.close()
+
+
+def copy_rows(cursor, table, columns, rows, chunk_size=100000):
+    query = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text);"
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        buffer = io.StringIO(''.join('\t'.join(str(value) for value in row) + '\n' for row in chunk))
+        cursor.copy_expert(query, buffer)
+
+
+def seed(conn, size, reseed=False):
+    """Fills the books and users tables with ``size`` rows each.
+
+    The tables are left alone when they already hold exactly the seeded rows,
+    so repeated runs at the same size skip the load.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(SCHEMA)
+        # leftovers of an interrupted run
+        cursor.execute('DELETE FROM books WHERE isbn_code >= %s;', (str(ISBN_WRITES), ))
+        cursor.execute('SELECT (SELECT count(*) FROM books), (SELECT count(*) FROM users);')
+        if not reseed and cursor.fetchone() == (size, size):
+            conn.commit()
+            return False
+        cursor.execute('TRUNCATE books, users RESTART IDENTITY;')
+        copy_rows(cursor, 'books', ('title', 'author', 'year', 'genre', 'isbn_code'), map(book_row, range(size)))
+        copy_rows(cursor, 'users', ('name', 'email', 'phone', 'user_code'), map(user_row, range(size)))
+    conn.commit()
+    with conn.cursor() as cursor:
+        conn.autocommit = True
+        cursor.execute('VACUUM ANALYZE books;')
+        cursor.execute('VACUUM ANALYZE users;')
+        conn.autocommit = False
+    return True
@@ -0,0 +1,36 @@
+import time, tracemalloc
+
+
+def summarize(samples):
+    # samples are durations in seconds
+    ordered = sorted(samples)
+    count = len(ordered)
+    total = sum(ordered)
+    return {
+        'runs': count,
+        'mean_ms': round(total / count * 1000, 3),
+        'p50_ms': round(ordered[int(0.5 * count)] * 1000, 3),
+        'p95_ms': round(ordered[min(count - 1, int(0.95 * count))] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'ops_per_second': round(count / total, 1) if total else None,
+    }
+
+
+def measure(func, runs, warmup=1):
+    """Times ``func(i)`` for each call, the first ``warmup`` calls are not kept"""
+    samples = []
+    for i in range(warmup + runs):
+        started = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples[warmup:])
+
+
+def peak_memory(func):
+    # traced separately from the timings, tracemalloc slows allocation down
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
@@ -1,19 +1,205 @@
 import psycopg2
-from psycopg2 import sql
-import os
+from psycopg2 import extensions
+from Exceptions.exceptions import PoolClosedError, PoolTimeoutError
+import atexit, os, threading, time
+
+
+def get_db_config():
+    # connection parameters, overridable through environment variables
+    return {
+        'dbname': os.getenv('DB_NAME', 'library'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD'),
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5432'),
+    }
+
+
+def get_pool_config():
+    return {
+        'minconn': int(os.getenv('DB_POOL_MIN', '1')),
+        'maxconn': int(os.getenv('DB_POOL_MAX', '10')),
+        'idle_timeout': float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300')),
+        'checkout_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'check_interval': float(os.getenv('DB_POOL_CHECK_INTERVAL', '30')),
+    }
+
+
+class PreparedConnection(extensions.connection):
+    """psycopg2 connection remembering the statements prepared on it.
+
+    Prepared statements live as long as the server session, through commits
+    and rollbacks, so the names are kept with the connection itself.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class ConnectionPool():
+    """Thread-safe pool of psycopg2 connections.
+
+    Idle connections are kept LIFO so the hottest ones are reused first, are
+    health checked on checkout when they sat unused for more than
+    ``check_interval`` seconds, and are closed once idle for longer than
+    ``idle_timeout`` seconds (never going below ``minconn``).
+    """
+
+    def __init__(self, minconn=1, maxconn=10, idle_timeout=300, checkout_timeout=30,
+                 check_interval=30, **conn_params) -> None:
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError('Invalid pool size: expected 0 <= minconn <= maxconn and maxconn >= 1')
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.check_interval = check_interval
+        self.conn_params = conn_params
+        self._idle = []  # (connection, last used) pairs, oldest first
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    @property
+    def size(self):
+        with self._cond:
+            return len(self._idle) + self._in_use
+
+    def _connect(self):
+        return psycopg2.connect(connection_factory=PreparedConnection, **self.conn_params)
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reap_idle(self):
+        # close connections idle for too long, keeping at least minconn open
+        now = time.monotonic()
+        while (self._idle and len(self._idle) + self._in_use > self.minconn
+               and now - self._idle[0][1] > self.idle_timeout):
+            conn, _ = self._idle.pop(0)
+            conn.close()
+
+    def getconn(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosedError()
+                self._reap_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.maxconn:
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(self.maxconn, self.checkout_timeout)
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        # network round trips happen outside the lock
+        try:
+            if conn is not None:
+                if self._is_healthy(conn, last_used):
+                    return conn
+                conn.close()
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, close=False):
+        if not conn.closed and not close:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        with self._cond:
+            self._in_use -= 1
+            if close or conn.closed or self._closed:
+                conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._reap_idle()
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                conn.close()
+            self._idle.clear()
+            self._cond.notify_all()
+
+
+class PooledConnection():
+    """Connection borrowed from a pool for a single operation.
+
+    Used as a context manager it yields the raw psycopg2 connection, commits
+    (or rolls back on error) and gives the connection back to the pool.
+    """
+
+    def __init__(self, pool) -> None:
+        self.pool = pool
+        self.conn = pool.getconn()
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.pool.putconn(self.conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(**get_pool_config(), **get_db_config())
+            atexit.register(_pool.closeall)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
 
-db_password = os.getenv('DB_PASSWORD')
 
 def get_connection():
     try:
-        conn = psycopg2.connect(
-            dbname="library",
-            user="postgres",
-            password=db_password,
-            host="localhost",
-            port="5432"
-        )
-        return conn
+        return PooledConnection(get_pool())
+    except PoolTimeoutError:
+        # a busy pool isn't a broken database, let the caller see it
+        raise
     except Exception as e:
         print(f"Database connection error: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,100 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.utils.http import parse_http_date_safe, urlencode
+
+from .conditional import not_modified, with_validators
+
+CATALOGUE_CACHE_TIMEOUT = getattr(settings, 'LIBRARY_CATALOGUE_CACHE_TIMEOUT', 3600)
+CATALOGUE_GENERATION = 'library:catalogue:generation'
+# Book fields shown on the list pages and the book cards; saves touching only
+# other fields (availability, the open loan) leave the lists in the cache
+CARD_FIELDS = frozenset({'title', 'author', 'year', 'isbn', 'cover_image', 'cover_thumbnails'})
+
+
+def book_generation(pk):
+    return f'library:book:{pk}:generation'
+
+
+def page_key(generation, request, params=()):
+    # only the query parameters the view reads tell pages apart, any other
+    # (tracking tags, junk) would fill one more entry with the same page
+    query = urlencode([(name, request.GET[name]) for name in sorted(params) if name in request.GET])
+    path = f'{request.path}?{query}' if query else request.path
+    return f'library:page:{generation}:{hashlib.md5(path.encode()).hexdigest()}'
+
+
+async def aget_generation(key):
+    # a generation lost to eviction is replaced by a new one, never reused
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, time.time_ns(), None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def invalidate_book(pk, listed=True):
+    """Drop the cached pages and fragments showing book ``pk`` once the transaction commits.
+
+    Cached pages live under generation keys: a change starts a new generation
+    instead of deleting pages, so a page rendered from the old data while the
+    transaction committed can't be served afterwards. ``listed=False`` keeps
+    the list pages, for changes the lists don't show.
+    """
+    def invalidate():
+        generations = {book_generation(pk): time.time_ns()}
+        fragments = [make_template_fragment_key('book_info', [pk])]
+        if listed:
+            generations[CATALOGUE_GENERATION] = time.time_ns()
+            fragments.append(make_template_fragment_key('book_card', [pk]))
+        cache.set_many(generations, None)
+        cache.delete_many(fragments)
+    transaction.on_commit(invalidate)
+
+
+def is_shared_page(request):
+    # anonymous visitors without pending messages all get the same page
+    return not request.user.is_authenticated and not len(get_messages(request))
+
+
+class CachedPageMixin:
+    """Serves whole pages to anonymous visitors from the cache.
+
+    ``cached_page`` looks the page up under ``generation_key`` and only calls
+    ``render`` on a miss, so a hit doesn't query the database at all. Logged in
+    users always get a fresh render, made cheaper by the fragment cache.
+    ``cache_params`` lists the query parameters the page depends on.
+    """
+    cache_timeout = CATALOGUE_CACHE_TIMEOUT
+    cache_params = ()
+
+    async def cached_page(self, request, generation_key, render):
+        shared = await sync_to_async(is_shared_page)(request)
+        if not shared:
+            return await render()
+        key = page_key(await aget_generation(generation_key), request, self.cache_params)
+        cached = await cache.aget(key)
+        if cached is not None:
+            content, etag, last_modified = cached
+            if etag is None:
+                return HttpResponse(content)
+            return (not_modified(request, etag, last_modified)
+                    or with_validators(HttpResponse(content), etag, last_modified))
+        response = await render()
+
+        def store(response):
+            # the validators are kept so hits can still answer with a 304
+            if response.status_code == 200:
+                last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+                cache.set(key, (response.content, response.get('ETag'), last_modified), self.cache_timeout)
+        if isinstance(response, SimpleTemplateResponse):
+            response.add_post_render_callback(store)
+        return response
@@ -0,0 +1,70 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import CatalogueVersion
+
+
+# the row the book triggers bump on every write, deletions included
+CATALOGUE_VERSION = CatalogueVersion.objects.filter(pk=1).values_list('version', 'updated_at')
+
+
+def catalogue_version():
+    """``(version, last modified)`` of the catalogue, ``(0, None)`` before any write"""
+    return CATALOGUE_VERSION.first() or (0, None)
+
+
+async def acatalogue_version():
+    return await CATALOGUE_VERSION.afirst() or (0, None)
+
+
+def page_validators(request, version, last_modified):
+    """ETag and Last-Modified timestamp of a page built from data at ``version``.
+
+    Pages differ per user, so the ETag covers who is asking too. None when the
+    page can't be revalidated: unknown resource or one-off messages to show.
+    """
+    if version is None or len(get_messages(request)):
+        return None
+    viewer = request.user.pk if request.user.is_authenticated else 'anonymous'
+    etag = quote_etag(hashlib.md5(f'{version}:{viewer}'.encode()).hexdigest())
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def with_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # always revalidate, browsers would otherwise guess a freshness from Last-Modified
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    """The 304 for ``request`` when it already holds this version, else None"""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return with_validators(response, etag, last_modified) if response is not None else None
+
+
+class ConditionalGetMixin:
+    """Answers If-None-Match / If-Modified-Since with a 304 before rendering.
+
+    The view computes the version of the data it shows with one cheap query
+    and passes it with the render callable; the page is only rendered when the
+    client's copy is stale.
+    """
+
+    def conditional(self, request, version, last_modified, render):
+        validators = page_validators(request, version, last_modified)
+        if validators is None:
+            return render()
+        return not_modified(request, *validators) or with_validators(render(), *validators)
+
+    async def aconditional(self, request, version, last_modified, render):
+        validators = await sync_to_async(page_validators)(request, version, last_modified)
+        if validators is None:
+            return await render()
+        return not_modified(request, *validators) or with_validators(await render(), *validators)
@@ -0,0 +1,16 @@
+class BookUnavailableError(Exception):
+    """Raised when a book is already lent or being checked out by someone else"""
+
+    def __init__(self, book_id):
+        self.book_id = book_id
+        self.message = "Este livro não está disponível para empréstimo."
+        super().__init__(self.message)
+
+
+class LoanNotFoundError(Exception):
+    """Raised when a loan doesn't exist or was already returned"""
+
+    def __init__(self, loan_id):
+        self.loan_id = loan_id
+        self.message = f"Empréstimo {self.loan_id} não encontrado ou já devolvido."
+        super().__init__(self.message)
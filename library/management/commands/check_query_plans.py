@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.plans import check_query_plans, hot_queries
+
+
+class Command(BaseCommand):
+    help = ('Fails if a hot query is not planned on its index: a sequential scan, a sort for the ordered '
+            'ones or another index.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='database whose plans are checked')
+
+    def handle(self, *args, **options):
+        queries = hot_queries()
+        failures = check_query_plans(queries, using=options['database'])
+        for name, *_ in queries:
+            if name in failures:
+                self.stdout.write(f"{name}: {'; '.join(failures[name])}")
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'{name}: ok')
+        if failures:
+            raise CommandError(f'{len(failures)} of {len(queries)} hot queries are not served by an index.')
+        self.stdout.write(f'All {len(queries)} hot queries are served by an index.')
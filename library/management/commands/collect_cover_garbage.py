@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from library.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Deletes the stored covers and thumbnails that no book refers to anymore.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=float, default=60,
+                            help='minutes a new file is kept even if unreferenced')
+        parser.add_argument('--dry-run', action='store_true', help='only report what would be deleted')
+
+    def handle(self, *args, **options):
+        deleted, freed = collect_garbage(grace=timedelta(minutes=options['grace']), dry_run=options['dry_run'])
+        verb = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(f'{deleted} unreferenced files {verb}, {freed / 1024 / 1024:.1f} MB.')
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.thumbnails import process_cover_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generates the WebP/JPEG thumbnails of the book covers waiting for them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='books claimed at a time')
+        parser.add_argument('--loop', action='store_true', help='keep watching the queue until interrupted')
+        parser.add_argument('--interval', type=float, default=5, help='seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            processed, failed = process_cover_thumbnails(batch_size=options['batch_size'])
+            if processed or not options['loop']:
+                self.stdout.write(f'{processed} covers processed, {failed} failed '
+                                  f'in {time.monotonic() - started:.1f}s.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.services import sweep_overdue_loans
+
+
+class Command(BaseCommand):
+    help = 'Computes the fines of overdue loans and marks the reminders that are due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='loans updated per transaction')
+        parser.add_argument('--loop', action='store_true', help='keep sweeping until interrupted')
+        parser.add_argument('--interval', type=float, default=3600, help='seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            swept, reminders = sweep_overdue_loans(batch_size=options['batch_size'])
+            self.stdout.write(f'{swept} overdue loans swept, {reminders} reminders marked '
+                              f'in {time.monotonic() - started:.1f}s.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
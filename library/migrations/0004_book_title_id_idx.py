@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_alter_book_synopsis'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'id'], name='library_book_title_id_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:06
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}author, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce({row}genre, '')), 'C') ||
+    setweight(to_tsvector('simple', coalesce({row}synopsis, '')), 'D')
+"""
+
+CREATE_TRIGGER = f"""
+CREATE FUNCTION library_book_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR.format(row='NEW.')};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER library_book_search_vector_trigger
+BEFORE INSERT OR UPDATE ON library_book
+FOR EACH ROW EXECUTE FUNCTION library_book_search_vector_update();
+
+UPDATE library_book SET search_vector = {SEARCH_VECTOR.format(row='')};
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS library_book_search_vector_trigger ON library_book;
+DROP FUNCTION IF EXISTS library_book_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_book_title_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='library_book_search_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_current_loans(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    Loan = apps.get_model('library', 'Loan')
+    open_loans = Loan.objects.filter(book=OuterRef('pk'), returned=False).order_by('-loan_date')
+    Book.objects.filter(avaible=False).update(current_loan=Subquery(open_loans.values('pk')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_book_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='current_loan',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='library.loan'),
+        ),
+        migrations.RunPython(set_current_loans, migrations.RunPython.noop),
+    ]
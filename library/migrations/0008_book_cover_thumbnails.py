@@ -0,0 +1,43 @@
+# Generated by Django 5.1.2 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+CREATE_TRIGGER = """
+CREATE FUNCTION library_book_cover_changed() RETURNS trigger AS $$
+BEGIN
+    NEW.cover_thumbnails := NULL;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER library_book_cover_changed_trigger
+BEFORE UPDATE OF cover_image ON library_book
+FOR EACH ROW WHEN (OLD.cover_image IS DISTINCT FROM NEW.cover_image)
+EXECUTE FUNCTION library_book_cover_changed();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS library_book_cover_changed_trigger ON library_book;
+DROP FUNCTION IF EXISTS library_book_cover_changed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_loan_fine_reminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_thumbnails',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('cover_thumbnails__isnull', True)), fields=['id'], name='library_book_thumb_queue_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
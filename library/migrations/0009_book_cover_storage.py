@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 21:52
+
+import library.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_book_cover_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, storage=library.storage.ContentHashStorage(directory='book_covers'), upload_to='book_covers/'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-18 22:05
+
+from django.db import migrations, models
+
+
+# clock_timestamp() rather than now(): a long transaction mustn't stamp its
+# rows with its start time, older than what readers may have seen meanwhile
+CREATE_TRIGGER = """
+CREATE FUNCTION library_book_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER library_book_touch_trigger
+BEFORE INSERT OR UPDATE ON library_book
+FOR EACH ROW EXECUTE FUNCTION library_book_touch();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS library_book_touch_trigger ON library_book;
+DROP FUNCTION IF EXISTS library_book_touch();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_book_cover_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['updated_at'], name='library_book_updated_at_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.2 on 2026-10-18 22:20
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# a partial unique index is what Django builds for this constraint; creating
+# it by hand lets it be built without locking out writes to library_loan
+CREATE_ONE_OPEN_LOAN = """
+CREATE UNIQUE INDEX CONCURRENTLY "library_loan_one_open_per_book" ON "library_loan" ("book_id") WHERE NOT "returned";
+"""
+
+DROP_ONE_OPEN_LOAN = """
+DROP INDEX CONCURRENTLY IF EXISTS "library_loan_one_open_per_book";
+"""
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('library', '0010_book_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['author', 'title', 'id'], name='library_book_author_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['genre', 'year'], name='library_book_genre_year_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(('avaible', True)), fields=['title', 'id'], name='library_book_available_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('returned', False)), fields=['user', 'return_date'], include=('book',), name='library_loan_user_open_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CREATE_ONE_OPEN_LOAN, DROP_ONE_OPEN_LOAN),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='loan',
+                    constraint=models.UniqueConstraint(condition=models.Q(('returned', False)), fields=('book',), name='library_loan_one_open_per_book'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.2 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+# once per statement, after it: a bulk UPDATE or DELETE bumps the version
+# once. The row is updated in the writer's transaction, so readers only see
+# the new version along with the rows it describes.
+CREATE_TRIGGER = """
+CREATE FUNCTION library_catalogue_bump() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO library_catalogueversion (id, version, updated_at) VALUES (1, 1, clock_timestamp())
+    ON CONFLICT (id) DO UPDATE
+    SET version = library_catalogueversion.version + 1, updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER library_catalogue_bump_trigger
+AFTER INSERT OR UPDATE OR DELETE ON library_book
+FOR EACH STATEMENT EXECUTE FUNCTION library_catalogue_bump();
+
+CREATE TRIGGER library_catalogue_truncate_trigger
+AFTER TRUNCATE ON library_book
+FOR EACH STATEMENT EXECUTE FUNCTION library_catalogue_bump();
+
+INSERT INTO library_catalogueversion (id, version, updated_at)
+SELECT 1, 1, coalesce(max(updated_at), clock_timestamp()) FROM library_book;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS library_catalogue_truncate_trigger ON library_book;
+DROP TRIGGER IF EXISTS library_catalogue_bump_trigger ON library_book;
+DROP FUNCTION IF EXISTS library_catalogue_bump();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
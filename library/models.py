@@ -1,6 +1,9 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from users.models import User
 from django.conf import settings
+from .storage import cover_storage
 
 class Book(models.Model):
     title = models.CharField(max_length=255)
@@ -9,14 +12,89 @@ class Book(models.Model):
     genre = models.CharField(max_length=100)
     isbn = models.CharField(max_length=13, unique=True)
     avaible = models.BooleanField(default=True)
-    cover_image = models.ImageField(upload_to='book_covers/', blank=True, null=True)
+    # stored by content hash: identical covers share one file
+    cover_image = models.ImageField(upload_to='book_covers/', storage=cover_storage, blank=True, null=True)
+    # resized copies of the cover, {extension: [[width, name], ...]}; NULL queues
+    # the book for library.thumbnails, a database trigger resets it when the cover changes
+    cover_thumbnails = models.JSONField(null=True, blank=True, editable=False)
     synopsis = models.TextField(null=True, blank=True)
+    # maintained by a database trigger from title, author, genre and synopsis
+    search_vector = SearchVectorField(null=True, editable=False)
+    # open loan of the book, kept in sync by library.services
+    current_loan = models.ForeignKey('Loan', on_delete=models.SET_NULL, null=True, blank=True,
+                                     editable=False, related_name='+')
+    # stamped by a database trigger on every write, queryset updates included;
+    # the validator of the conditional GETs in library.conditional
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['title', 'id'], name='library_book_title_id_idx'),
+            GinIndex(fields=['search_vector'], name='library_book_search_idx'),
+            # covers waiting for thumbnails
+            models.Index(fields=['id'], condition=models.Q(cover_thumbnails__isnull=True),
+                         name='library_book_thumb_queue_idx'),
+            models.Index(fields=['updated_at'], name='library_book_updated_at_idx'),
+            # books of an author, and of a genre and year, in catalogue order
+            models.Index(fields=['author', 'title', 'id'], name='library_book_author_idx'),
+            models.Index(fields=['genre', 'year'], name='library_book_genre_year_idx'),
+            models.Index(fields=['title', 'id'], condition=models.Q(avaible=True),
+                         name='library_book_available_idx'),
+        ]
+
     def __str__(self):
         return  self.title
 
+    def cover_srcset(self, extension):
+        names = (self.cover_thumbnails or {}).get(extension, [])
+        return ', '.join(f'{self.cover_image.storage.url(name)} {width}w' for width, name in names)
+
+    @property
+    def cover_webp_srcset(self):
+        return self.cover_srcset('webp')
+
+    @property
+    def cover_jpeg_srcset(self):
+        return self.cover_srcset('jpg')
+
+    @property
+    def cover_thumbnail_url(self):
+        # smallest JPEG for browsers without srcset, the original until the thumbnails exist
+        names = (self.cover_thumbnails or {}).get('jpg')
+        if names:
+            return self.cover_image.storage.url(names[0][1])
+        return self.cover_image.url if self.cover_image else ''
+
+class CatalogueVersion(models.Model):
+    """Single row bumped by a database trigger on every write to the books.
+
+    The validator of the catalogue lists' conditional GETs: one primary key
+    read instead of aggregating the whole table. The trigger creates the row
+    if it is missing.
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True)
+
+
 class Loan(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     loan_date = models.DateTimeField(auto_now_add=True)
     return_date = models.DateField()
     returned = models.BooleanField(default=False)
+    fine = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # only open loans are ever swept for being overdue
+            models.Index(fields=['return_date', 'id'], condition=models.Q(returned=False),
+                         name='library_loan_open_due_idx'),
+            # open loans of a user by due date, the books read from the index itself
+            models.Index(fields=['user', 'return_date'], condition=models.Q(returned=False), include=['book'],
+                         name='library_loan_user_open_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['book'], condition=models.Q(returned=False),
+                                    name='library_loan_one_open_per_book'),
+        ]
@@ -0,0 +1,130 @@
+import base64
+import json
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.http import Http404
+
+
+def encode_token(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise Http404('Página inválida.')
+    if not isinstance(values, list) or len(values) != 2:
+        raise Http404('Página inválida.')
+    # tokens come from the client: only a (title, id) pair may reach the filters
+    value, pk = values
+    if not isinstance(value, str) or '\x00' in value or not isinstance(pk, int) or isinstance(pk, bool):
+        raise Http404('Página inválida.')
+    return values
+
+
+class KeysetPage:
+    """Page of a keyset paginated list, exposed to templates as page_obj"""
+
+    def __init__(self, object_list, next_token=None, previous_token=None):
+        self.object_list = object_list
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    @property
+    def has_next(self):
+        return self.next_token is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_token is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginationMixin:
+    """Cursor based pagination for ListView on a unique (field, pk) ordering.
+
+    Pages are selected with ``?after=<token>`` / ``?before=<token>`` instead
+    of an OFFSET, so fetching any page costs the same index range scan as the
+    first one. The ordering needs a matching (field, id) index.
+    """
+    paginate_by = 20
+    keyset_field = 'title'
+
+    def get_ordering(self):
+        return (self.keyset_field, 'id')
+
+    def key(self, obj):
+        return [getattr(obj, self.keyset_field), obj.pk]
+
+    def after(self, queryset, value, pk):
+        # the leading range condition lets the (field, id) index drive the scan
+        field = self.keyset_field
+        return queryset.filter(Q(**{f'{field}__gte': value}),
+                               Q(**{f'{field}__gt': value}) | Q(pk__gt=pk))
+
+    def before(self, queryset, value, pk):
+        field = self.keyset_field
+        return queryset.filter(Q(**{f'{field}__lte': value}),
+                               Q(**{f'{field}__lt': value}) | Q(pk__lt=pk))
+
+    def keyset_queryset(self, queryset, page_size):
+        # the requested page plus one row telling whether there is another
+        after = self.request.GET.get('after')
+        before = self.request.GET.get('before')
+        field = self.keyset_field
+        if before:
+            return self.before(queryset, *decode_token(before)).order_by(f'-{field}', '-id')[:page_size + 1]
+        if after:
+            queryset = self.after(queryset, *decode_token(after))
+        return queryset.order_by(field, 'id')[:page_size + 1]
+
+    def keyset_page(self, rows, page_size):
+        if self.request.GET.get('before'):
+            has_more = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            has_next, has_previous = True, has_more
+        else:
+            has_next = len(rows) > page_size
+            rows = rows[:page_size]
+            has_previous = bool(self.request.GET.get('after'))
+
+        page = KeysetPage(
+            rows,
+            next_token=encode_token(self.key(rows[-1])) if rows and has_next else None,
+            previous_token=encode_token(self.key(rows[0])) if rows and has_previous else None,
+        )
+        return None, page, rows, page.has_other_pages()
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.keyset_page(list(self.keyset_queryset(queryset, page_size)), page_size)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        rows = [obj async for obj in self.keyset_queryset(queryset, page_size)]
+        return self.keyset_page(rows, page_size)
+
+
+class AsyncPaginator(Paginator):
+    """Paginator whose count and pages are fetched with the async ORM"""
+
+    async def apage(self, number):
+        if 'count' not in self.__dict__:
+            # primes the cached count used by num_pages and validate_number
+            self.__dict__['count'] = await self.object_list.acount()
+        try:
+            number = self.validate_number(number)
+        except InvalidPage:
+            raise Http404('Página inválida.')
+        bottom = (number - 1) * self.per_page
+        rows = [obj async for obj in self.object_list[bottom:bottom + self.per_page]]
+        return self._get_page(rows, number, self)
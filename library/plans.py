@@ -0,0 +1,70 @@
+import json
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from query_plans import plan_problems
+
+from .models import Book, CatalogueVersion, Loan
+from .pagination import KeysetPaginationMixin
+
+
+def hot_queries():
+    """``(name, queryset, ordered, index)`` of the queries the pages and workers run most.
+
+    ``ordered`` queries must get their order from an index, not a sort, and
+    ``index``, when given, is the one the plan must use: a missing index often
+    shows as a filtered full scan of another one rather than as a Seq Scan.
+    """
+    User = get_user_model()
+    catalogue = KeysetPaginationMixin()
+    return [
+        ('catalogue page', Book.objects.order_by('title', 'id')[:21], True, 'library_book_title_id_idx'),
+        ('next catalogue page', catalogue.after(Book.objects.all(), 'M', 1).order_by('title', 'id')[:21],
+         True, 'library_book_title_id_idx'),
+        # primary key joins, their order follows the table statistics
+        ('book page', Book.objects.select_related('current_loan__user').filter(pk=1), False, None),
+        ('catalogue version', CatalogueVersion.objects.filter(pk=1), False, None),
+        ('book by isbn', Book.objects.filter(isbn='9780000000000'), False, None),
+        ('books by author', Book.objects.filter(author='Machado de Assis').order_by('title', 'id'),
+         True, 'library_book_author_idx'),
+        ('books by genre and year', Book.objects.filter(genre='Romance', year='1899'),
+         False, 'library_book_genre_year_idx'),
+        ('available books', Book.objects.filter(avaible=True).order_by('title', 'id')[:21],
+         True, 'library_book_available_idx'),
+        ('cover thumbnail queue', Book.objects.filter(cover_thumbnails__isnull=True, pk__gt=0).exclude(cover_image='')
+         .order_by('id').values_list('pk', flat=True)[:20], True, 'library_book_thumb_queue_idx'),
+        ('open loans of a user', Loan.objects.filter(user_id=1, returned=False).order_by('return_date')
+         .values_list('book_id', 'return_date'), True, 'library_loan_user_open_idx'),
+        ('open loan of a book', Loan.objects.filter(book_id=1, returned=False),
+         False, 'library_loan_one_open_per_book'),
+        ('overdue loans', Loan.objects.filter(returned=False, return_date__lt=date(2000, 1, 1))
+         .order_by('return_date', 'id')[:1000], True, 'library_loan_open_due_idx'),
+        ('user by email', User.objects.filter(email='reader@example.com'), False, None),
+        ('staff users', User.objects.filter(is_staff=True).order_by('email')[:100], True, 'users_user_staff_email_idx'),
+    ]
+
+
+def check_query_plans(queries=None, using=DEFAULT_DB_ALIAS):
+    """``{name: problems}`` of the hot queries whose plan doesn't rely on indexes only.
+
+    The queries are EXPLAINed, not run, with sequential scans disabled, and
+    sorts too for the ordered ones. The planner only falls back to them when
+    no index can serve the query, so the check gives the same answer on an
+    empty test database as on production sized tables.
+    """
+    queries = hot_queries() if queries is None else queries
+    failures = {}
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, queryset, ordered, index in queries:
+                cursor.execute(f"SET LOCAL enable_sort = {'off' if ordered else 'on'}")
+                plan = json.loads(queryset.using(using).explain(format='json'))[0]['Plan']
+                problems = plan_problems(plan, ordered, index)
+                if problems:
+                    failures[name] = problems
+        # undoes the SET LOCALs, also when nested in an outer transaction
+        transaction.set_rollback(True, using=using)
+    return failures
@@ -0,0 +1,28 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+from .models import Book
+
+# text search configuration used by the search_vector trigger, see
+# migration 0005; 'simple' avoids stemming so prefixes match as typed
+SEARCH_CONFIG = 'simple'
+
+
+def prefix_query(text):
+    # "harry pot" -> "harry:* & pot:*", dropping anything tsquery would parse
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_books(text):
+    """Books matching every term of ``text``, best ranked first"""
+    query = prefix_query(text)
+    if query is None:
+        return Book.objects.none()
+    return (Book.objects.filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', 'id'))
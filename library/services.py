@@ -0,0 +1,90 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidate_book
+from .exceptions import BookUnavailableError, LoanNotFoundError
+from .models import Book, Loan
+
+LOAN_DAYS = getattr(settings, 'LIBRARY_LOAN_DAYS', 14)
+FINE_PER_DAY = Decimal(getattr(settings, 'LIBRARY_FINE_PER_DAY', '1.00'))
+REMINDER_INTERVAL_DAYS = getattr(settings, 'LIBRARY_REMINDER_INTERVAL_DAYS', 3)
+
+
+@transaction.atomic
+def checkout(user, book_id, days=LOAN_DAYS):
+    """Lend an available book to ``user``.
+
+    The book row is locked with SKIP LOCKED, so a terminal racing another one
+    for the same copy fails immediately instead of queueing behind its lock.
+    """
+    book = (Book.objects.select_for_update(skip_locked=True)
+            .filter(pk=book_id, avaible=True).first())
+    if book is None:
+        raise BookUnavailableError(book_id)
+    loan = Loan.objects.create(user=user, book=book, return_date=timezone.localdate() + timedelta(days=days))
+    book.avaible = False
+    book.current_loan = loan
+    book.save(update_fields=['avaible', 'current_loan'])
+    return loan
+
+
+@transaction.atomic
+def return_book(loan_id):
+    loan = Loan.objects.select_for_update().filter(pk=loan_id, returned=False).first()
+    if loan is None:
+        raise LoanNotFoundError(loan_id)
+    loan.returned = True
+    loan.save(update_fields=['returned'])
+    Book.objects.filter(pk=loan.book_id).update(avaible=True, current_loan=None)
+    invalidate_book(loan.book_id, listed=False)
+    return loan
+
+
+@transaction.atomic
+def renew(loan_id, days=LOAN_DAYS):
+    loan = Loan.objects.select_for_update().filter(pk=loan_id, returned=False).first()
+    if loan is None:
+        raise LoanNotFoundError(loan_id)
+    loan.return_date = max(loan.return_date, timezone.localdate()) + timedelta(days=days)
+    loan.save(update_fields=['return_date'])
+    # the due date shows on the book's pages, its updated_at must move
+    Book.objects.filter(pk=loan.book_id).update(updated_at=timezone.now())
+    return loan
+
+
+def sweep_overdue_loans(batch_size=1000, today=None):
+    """Update the fine of every overdue open loan and mark due reminders.
+
+    Loans are walked in (return_date, id) order through the partial index on
+    open loans, one short transaction per batch. Rows locked by a concurrent
+    return are skipped and picked up by the next sweep. Returns the number of
+    loans swept and of reminders marked.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    remind_before = now - timedelta(days=REMINDER_INTERVAL_DAYS)
+    overdue = Loan.objects.filter(returned=False, return_date__lt=today).order_by('return_date', 'id')
+    swept = reminders = 0
+    last = None
+    while True:
+        with transaction.atomic():
+            batch = overdue
+            if last is not None:
+                batch = batch.filter(Q(return_date__gte=last[0]), Q(return_date__gt=last[0]) | Q(id__gt=last[1]))
+            loans = list(batch.select_for_update(skip_locked=True)[:batch_size])
+            if not loans:
+                break
+            for loan in loans:
+                loan.fine = FINE_PER_DAY * (today - loan.return_date).days
+                if loan.reminder_sent_at is None or loan.reminder_sent_at < remind_before:
+                    loan.reminder_sent_at = now
+                    reminders += 1
+            Loan.objects.bulk_update(loans, ['fine', 'reminder_sent_at'])
+        swept += len(loans)
+        last = (loans[-1].return_date, loans[-1].id)
+    return swept, reminders
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import CARD_FIELDS, invalidate_book
+from .models import Book, Loan
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, update_fields=None, **kwargs):
+    listed = update_fields is None or not CARD_FIELDS.isdisjoint(update_fields)
+    invalidate_book(instance.pk, listed=listed)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    invalidate_book(instance.pk)
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def loan_changed(sender, instance, **kwargs):
+    # loans only show on the detail page of their book
+    invalidate_book(instance.book_id, listed=False)
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import posixpath
+import re
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(?:.*/)?[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w+)?$')
+# far-future caching is only safe for names that change with the content
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_hashed_name(name):
+    return HASHED_NAME.match(name) is not None
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """File storage naming every file after the SHA-256 of its bytes.
+
+    A file saved as ``cover.png`` is stored as ``<directory>/ab/ab12...ef.png``
+    whatever directory it was proposed under, and saving the same bytes again
+    returns the existing name instead of writing a copy. Names never change
+    content, so they can be cached forever; files no longer referenced are
+    removed by :func:`collect_garbage`.
+    """
+
+    def __init__(self, directory='', **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+
+    def hashed_name(self, name, content):
+        digest = content_hash(content)
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(self.directory, digest[:2], digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # the proposed name is replaced in _save; a hashed name already taken
+        # holds the same bytes, written by a concurrent save
+        if is_hashed_name(name) and self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.touch(name):
+            return name
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            self.touch(name)
+            return name
+
+    def touch(self, name):
+        # a reused file is as new as a written one: collect_garbage spares
+        # recent files until the row pointing to them is committed
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def walk(self, path=None):
+        """Yield the name of every file under ``path``, the storage directory by default"""
+        path = self.directory if path is None else path
+        directories, files = self.listdir(path)
+        for filename in files:
+            yield posixpath.join(path, filename)
+        for directory in directories:
+            yield from self.walk(posixpath.join(path, directory))
+
+
+cover_storage = ContentHashStorage(directory='book_covers')
+
+
+def referenced_covers(chunk_size=2000):
+    """Names of every cover and thumbnail some book points to"""
+    from .models import Book
+
+    names = set()
+    rows = (Book.objects.exclude(cover_image='').exclude(cover_image__isnull=True)
+            .values_list('cover_image', 'cover_thumbnails').iterator(chunk_size=chunk_size))
+    for cover, thumbnails in rows:
+        names.add(cover)
+        for sizes in (thumbnails or {}).values():
+            names.update(name for _, name in sizes)
+    return names
+
+
+def collect_garbage(storage=cover_storage, grace=timedelta(hours=1), dry_run=False):
+    """Delete the files of ``storage`` no book refers to.
+
+    Files younger than ``grace`` are kept: they may belong to an upload, or a
+    thumbnail run, whose transaction isn't committed yet. Returns the number of
+    files deleted and the bytes they used.
+    """
+    referenced = referenced_covers()
+    cutoff = timezone.now() - grace
+    deleted = freed = 0
+    for name in storage.walk():
+        if name in referenced or storage.get_modified_time(name) > cutoff:
+            continue
+        size = storage.size(name)
+        if not dry_run:
+            storage.delete(name)
+        deleted += 1
+        freed += size
+    return deleted, freed
@@ -1,3 +1,800 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import skipIf
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from library_management_web.middleware import QueryBudgetExceeded
+from users.models import User
+from . import plans, services, storage, thumbnails
+from .conditional import catalogue_version
+from .exceptions import BookUnavailableError, LoanNotFoundError
+from .models import Book, Loan
+from .pagination import KeysetPaginationMixin, encode_token
+from .views import BookDetailView, BookHomeListView, BookSearchView
+
+
+class BookListPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # two books share the same title so the id tie-breaker is exercised
+        titles = ['Alpha', 'Beta', 'Beta', 'Delta', 'Epsilon']
+        for code, title in enumerate(titles):
+            Book.objects.create(title=title, author='Author', year='1990', genre='Genre', isbn=str(1000 + code))
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch.object(KeysetPaginationMixin, 'paginate_by', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def titles(self, response):
+        return [book.title for book in response.context['object_list']]
+
+    def test_home_walks_forward_and_back_through_pages(self):
+        url = reverse('library:home')
+        first = self.client.get(url)
+
+        self.assertEqual(self.titles(first), ['Alpha', 'Beta'])
+        page = first.context['page_obj']
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+
+        second = self.client.get(url, {'after': page.next_token})
+        self.assertEqual(self.titles(second), ['Beta', 'Delta'])
+
+        back = self.client.get(url, {'before': second.context['page_obj'].previous_token})
+        self.assertEqual(self.titles(back), ['Alpha', 'Beta'])
+        self.assertFalse(back.context['page_obj'].has_previous)
+
+    def test_last_page_has_no_next_token(self):
+        url = reverse('library:books')
+        page = self.client.get(url).context['page_obj']
+        while page.has_next:
+            page = self.client.get(url, {'after': page.next_token}).context['page_obj']
+
+        self.assertEqual(page.object_list[-1].title, 'Epsilon')
+
+    def test_invalid_token_returns_404(self):
+        response = self.client.get(reverse('library:home'), {'after': 'not-a-token'})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_token_with_values_of_the_wrong_type_returns_404(self):
+        for values in ([{'a': 1}, []], ['Beta', '2'], ['Beta', True], [None, 2], ['Be\x00ta', 2]):
+            for url in (reverse('library:home'), reverse('library:books')):
+                with self.subTest(values=values, url=url):
+                    response = self.client.get(url, {'before': encode_token(values)})
+                    self.assertEqual(response.status_code, 404)
+
+
+class BookSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Book.objects.create(title='Dom Casmurro', author='Machado de Assis', year='1899', genre='Romance', isbn='1',
+                            synopsis='Bentinho e Capitu.')
+        Book.objects.create(title='Memórias Póstumas', author='Machado de Assis', year='1881', genre='Romance', isbn='2')
+        Book.objects.create(title='O Cortiço', author='Aluísio Azevedo', year='1890', genre='Naturalismo', isbn='3',
+                            synopsis='Inspirado em Dom Casmurro?')
+
+    def search(self, text):
+        response = self.client.get(reverse('library:search'), {'q': text})
+        return [book.isbn for book in response.context['object_list']]
+
+    def test_search_vector_is_kept_in_sync_on_write(self):
+        book = Book.objects.get(isbn='2')
+        book.title = 'Quincas Borba'
+        book.save()
+
+        self.assertEqual(self.search('quincas'), ['2'])
+        self.assertEqual(self.search('memórias'), [])
+
+    def test_prefix_matching_requires_every_term(self):
+        self.assertEqual(self.search('mach ass'), ['1', '2'])
+        self.assertEqual(self.search('mach azev'), [])
+
+    def test_title_matches_rank_above_synopsis_matches(self):
+        self.assertEqual(self.search('casmurro'), ['1', '3'])
+
+    def test_empty_query_returns_nothing(self):
+        self.assertEqual(self.search('  &|! '), [])
+
+
+class LoanServiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader@test.com', '12345678901', 'Reader', 'One', 'secret-pass')
+        cls.book = Book.objects.create(title='Title', author='Author', year='1990', genre='Genre', isbn='1')
+
+    def test_checkout_lends_the_book_and_return_makes_it_available_again(self):
+        loan = services.checkout(self.user, self.book.pk, days=7)
+
+        self.book.refresh_from_db()
+        self.assertFalse(self.book.avaible)
+        self.assertEqual(self.book.current_loan, loan)
+        self.assertEqual(loan.return_date, timezone.localdate() + timedelta(days=7))
+
+        services.return_book(loan.pk)
+
+        self.book.refresh_from_db()
+        loan.refresh_from_db()
+        self.assertTrue(self.book.avaible)
+        self.assertIsNone(self.book.current_loan)
+        self.assertTrue(loan.returned)
+
+    def test_a_book_has_one_open_loan_at_most(self):
+        services.checkout(self.user, self.book.pk)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Loan.objects.create(user=self.user, book=self.book, return_date=timezone.localdate())
+
+    def test_checkout_of_a_lent_book_raises_book_unavailable_error(self):
+        services.checkout(self.user, self.book.pk)
+
+        with self.assertRaises(BookUnavailableError):
+            services.checkout(self.user, self.book.pk)
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_returned_loan_cant_be_returned_or_renewed(self):
+        loan = services.checkout(self.user, self.book.pk)
+        services.return_book(loan.pk)
+
+        with self.assertRaises(LoanNotFoundError):
+            services.return_book(loan.pk)
+        with self.assertRaises(LoanNotFoundError):
+            services.renew(loan.pk)
+
+    def test_renew_extends_the_return_date(self):
+        loan = services.checkout(self.user, self.book.pk, days=7)
+
+        loan = services.renew(loan.pk, days=7)
+
+        self.assertEqual(loan.return_date, timezone.localdate() + timedelta(days=14))
+
+    def test_checkout_view_requires_login(self):
+        response = self.client.post(reverse('library:checkout', args=[self.book.pk]))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Loan.objects.exists())
+
+    def test_checkout_view_lends_to_the_logged_user(self):
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse('library:checkout', args=[self.book.pk]), follow=True)
+
+        self.assertRedirects(response, reverse('library:book_detail', args=[self.book.pk]))
+        self.assertEqual(Loan.objects.get().user, self.user)
+        self.assertContains(response, 'Devolver')
+
+    def test_only_the_borrower_and_staff_return_or_renew_a_loan(self):
+        other = User.objects.create_user('other@test.com', '12345678902', 'Other', 'Two', 'secret-pass',
+                                         phone='11999990002')
+        staff = User.objects.create_user('desk@test.com', '12345678903', 'Desk', 'Three', 'secret-pass',
+                                         phone='11999990003', is_staff=True)
+        loan = services.checkout(self.user, self.book.pk, days=7)
+        detail = reverse('library:book_detail', args=[self.book.pk])
+
+        self.client.force_login(other)
+        for name in ('library:return_loan', 'library:renew_loan'):
+            self.assertEqual(self.client.post(reverse(name, args=[loan.pk])).status_code, 404)
+        loan.refresh_from_db()
+        self.assertFalse(loan.returned)
+        self.assertEqual(loan.return_date, timezone.localdate() + timedelta(days=7))
+        response = self.client.get(detail)
+        self.assertNotContains(response, 'Devolver')
+        self.assertNotContains(response, 'reader@test.com')
+
+        self.client.force_login(staff)
+        response = self.client.get(detail)
+        self.assertContains(response, 'Devolver')
+        self.assertContains(response, 'Emprestado para:</strong> reader@test.com')
+        self.client.post(reverse('library:return_loan', args=[loan.pk]))
+        loan.refresh_from_db()
+        self.assertTrue(loan.returned)
+
+
+class BookAdminListQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('reader@test.com', '12345678901', 'Reader', 'One', 'secret-pass')
+        for code in range(6):
+            book = Book.objects.create(title=f'Title {code}', author='Author', year='1990', genre='Genre',
+                                       isbn=str(code))
+            if code % 2:
+                services.checkout(user, book.pk)
+
+    def test_books_page_costs_two_queries_regardless_of_page_size(self):
+        for page_size in (2, 6):
+            with patch.object(KeysetPaginationMixin, 'paginate_by', page_size):
+                # the conditional GET validator and the page
+                with self.assertNumQueries(2):
+                    response = self.client.get(reverse('library:books'))
+            self.assertEqual(len(response.context['object_list']), page_size)
+
+    def test_books_page_shows_the_current_loan_dates(self):
+        loan = Book.objects.get(isbn='1').current_loan
+
+        response = self.client.get(reverse('library:books'))
+
+        self.assertContains(response, loan.return_date.strftime('%d/%m/%Y'))
+        self.assertContains(response, 'Indisponível', count=3)
+
+
+class OverdueLoanSweepTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader@test.com', '12345678901', 'Reader', 'One', 'secret-pass')
+        today = timezone.localdate()
+        for code, days_late in enumerate([5, 1, 0, -3, 2]):
+            book = Book.objects.create(title=f'Title {code}', author='Author', year='1990', genre='Genre',
+                                       isbn=str(code))
+            Loan.objects.create(user=cls.user, book=book, return_date=today - timedelta(days=days_late))
+
+    def test_sweep_fines_overdue_loans_in_batches(self):
+        swept, reminders = services.sweep_overdue_loans(batch_size=2)
+
+        self.assertEqual((swept, reminders), (3, 3))
+        fines = dict(Loan.objects.values_list('book__isbn', 'fine'))
+        self.assertEqual(fines, {'0': 5 * services.FINE_PER_DAY, '1': services.FINE_PER_DAY,
+                                 '2': 0, '3': 0, '4': 2 * services.FINE_PER_DAY})
+
+    def test_reminders_are_not_marked_again_before_the_interval(self):
+        services.sweep_overdue_loans()
+
+        swept, reminders = services.sweep_overdue_loans()
+
+        self.assertEqual((swept, reminders), (3, 0))
+
+    def test_returned_loans_are_not_swept(self):
+        Loan.objects.update(returned=True)
+
+        self.assertEqual(services.sweep_overdue_loans(), (0, 0))
+
+    def test_command_reports_the_sweep(self):
+        out = StringIO()
+
+        call_command('sweep_overdue_loans', stdout=out)
+
+        self.assertIn('3 overdue loans swept, 3 reminders marked', out.getvalue())
+
+
+class QueryTimingMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Book.objects.create(title='Title', author='Author', year='1990', genre='Genre', isbn='1')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_response_carries_server_timing(self):
+        response = self.client.get(reverse('library:home'))
+
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_request_is_logged_with_its_view_and_query_count(self):
+        with self.assertLogs('library_management_web.performance', 'INFO') as logs:
+            self.client.get(reverse('library:home'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'library:home')
+        self.assertEqual(record['queries'], 2)
+        self.assertFalse(record['over_budget'])
+
+    @skipIf('PERFORMANCE_LOG_LEVEL' in os.environ, 'the performance log level is set by the environment')
+    def test_requests_within_budget_are_not_logged_by_default(self):
+        self.assertFalse(logging.getLogger('library_management_web.performance').isEnabledFor(logging.INFO))
+
+    @override_settings(QUERY_BUDGETS={'library:home': 0}, QUERY_BUDGET_STRICT=False)
+    def test_requests_over_budget_are_logged_as_warnings(self):
+        with self.assertLogs('library_management_web.performance', 'WARNING') as logs:
+            self.client.get(reverse('library:home'))
+
+        self.assertTrue(json.loads(logs.records[0].getMessage())['over_budget'])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_logged_in_pages_fit_their_budgets_in_strict_mode(self):
+        user = User.objects.create_user('reader@test.com', '12345678901', 'Reader', 'One', 'secret-pass')
+        book = Book.objects.get()
+        services.checkout(user, book.pk)
+        self.client.force_login(user)
+
+        with self.assertNoLogs('library_management_web.performance', 'WARNING'):
+            for url in (reverse('library:home'), reverse('library:books'),
+                        reverse('library:book_detail', args=[book.pk]), reverse('library:search') + '?q=title'):
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'library:home': 0}, QUERY_BUDGET_STRICT=True)
+    def test_strict_mode_raises_over_budget(self):
+        with self.assertLogs('library_management_web.performance', 'WARNING'):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('library:home'))
+
+
+class AsyncReadViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('reader@test.com', '12345678901', 'Reader', 'One', 'secret-pass')
+        cls.book = Book.objects.create(title='Dom Casmurro', author='Machado de Assis', year='1899',
+                                       genre='Romance', isbn='1')
+        Book.objects.create(title='Quincas Borba', author='Machado de Assis', year='1891', genre='Romance', isbn='2')
+        services.checkout(user, cls.book.pk)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_read_views_are_async(self):
+        for view in (BookHomeListView, BookDetailView, BookSearchView):
+            self.assertTrue(view.view_is_async)
+
+    async def test_home_lists_books_with_one_query_besides_the_validator(self):
+        response = await self.async_client.get(reverse('library:home'))
+
+        self.assertEqual([book.isbn for book in response.context['object_list']], ['1', '2'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    async def test_detail_shows_the_active_loan_without_the_borrower(self):
+        response = await self.async_client.get(reverse('library:book_detail', args=[self.book.pk]))
+
+        self.assertContains(response, 'Devolução prevista')
+        self.assertNotContains(response, 'reader@test.com')
+        self.assertEqual(response.context['active_loan'].user.email, 'reader@test.com')
+
+    async def test_detail_of_unknown_book_is_404(self):
+        response = await self.async_client.get(reverse('library:book_detail', args=[0]))
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_search_is_paginated(self):
+        with patch.object(BookSearchView, 'paginate_by', 1):
+            response = await self.async_client.get(reverse('library:search'), {'q': 'machado', 'page': 2})
+            invalid = await self.async_client.get(reverse('library:search'), {'q': 'machado', 'page': 3})
+
+        self.assertEqual([book.isbn for book in response.context['object_list']], ['2'])
+        self.assertEqual(response.context['paginator'].num_pages, 2)
+        self.assertEqual(invalid.status_code, 404)
+
+
+def cover_upload(name='cover.png', size=(800, 1200), color=(200, 30, 30, 255)):
+    buffer = BytesIO()
+    Image.new('RGBA', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class CoverMediaMixin:
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_book(self, isbn='1', **fields):
+        return Book.objects.create(title='Title', author='Author', year='1990', genre='Genre', isbn=isbn, **fields)
+
+
+class CoverTestCase(CoverMediaMixin, TestCase):
+    pass
+
+
+class CoverThumbnailTests(CoverTestCase):
+
+    def test_worker_generates_every_width_and_format(self):
+        book = self.create_book(cover_image=cover_upload())
+        self.create_book(isbn='2')  # no cover, not queued
+
+        self.assertEqual(thumbnails.process_cover_thumbnails(), (1, 0))
+
+        book.refresh_from_db()
+        self.assertEqual([width for width, _ in book.cover_thumbnails['webp']], [160, 320, 640])
+        width, name = book.cover_thumbnails['jpg'][1]
+        self.assertRegex(name, r'^book_covers/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        with Image.open(book.cover_image.storage.path(name)) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (320, 480)))
+        self.assertEqual(thumbnails.process_cover_thumbnails(), (0, 0))
+
+    def test_narrow_covers_are_not_upscaled(self):
+        book = self.create_book(cover_image=cover_upload(size=(100, 150)))
+
+        thumbnails.process_cover_thumbnails()
+
+        book.refresh_from_db()
+        self.assertEqual([width for width, _ in book.cover_thumbnails['webp']], [100])
+
+    def test_replacing_the_cover_queues_the_book_again(self):
+        book = self.create_book(cover_image=cover_upload())
+        thumbnails.process_cover_thumbnails()
+        book.refresh_from_db()
+
+        book.title = 'Other title'
+        book.save()
+        book.refresh_from_db()
+        self.assertIsNotNone(book.cover_thumbnails)
+
+        book.cover_image = cover_upload('other.png', color=(30, 30, 200, 255))
+        book.save()
+        book.refresh_from_db()
+        self.assertIsNone(book.cover_thumbnails)
+
+    def test_unreadable_covers_are_logged_and_skipped(self):
+        book = self.create_book(cover_image=SimpleUploadedFile('cover.png', b'not an image'))
+
+        with self.assertLogs('library.thumbnails', 'WARNING'):
+            self.assertEqual(thumbnails.process_cover_thumbnails(), (1, 1))
+
+        book.refresh_from_db()
+        self.assertEqual(book.cover_thumbnails, {})
+
+    def test_home_serves_srcset_once_thumbnails_exist(self):
+        book = self.create_book(cover_image=cover_upload())
+
+        response = self.client.get(reverse('library:home'))
+        self.assertContains(response, f'src="{book.cover_image.url}"')
+        self.assertNotContains(response, 'srcset=')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_cover_thumbnails', stdout=StringIO())
+        book.refresh_from_db()
+        response = self.client.get(reverse('library:home'))
+        webp = [f'/media/{name} {width}w' for width, name in book.cover_thumbnails['webp']]
+        self.assertContains(response, f'srcset="{", ".join(webp)}"')
+        self.assertContains(response, f'src="/media/{book.cover_thumbnails["jpg"][0][1]}"')
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    def test_cover_replaced_while_rendering_keeps_the_book_queued(self):
+        book = self.create_book(cover_image=cover_upload())
+        generate = thumbnails.generate_cover_thumbnails
+
+        def replace_cover_meanwhile(claimed):
+            result = generate(claimed)
+            replaced = Book.objects.get(pk=claimed.pk)
+            replaced.cover_image = cover_upload('other.png', color=(30, 30, 200, 255))
+            replaced.save()
+            return result
+
+        with patch.object(thumbnails, 'generate_cover_thumbnails', side_effect=replace_cover_meanwhile):
+            self.assertEqual(thumbnails.process_cover_thumbnails(), (1, 0))
+
+        book.refresh_from_db()
+        self.assertIsNone(book.cover_thumbnails)
+        self.assertEqual(thumbnails.process_cover_thumbnails(), (1, 0))
+        book.refresh_from_db()
+        self.assertEqual(len(book.cover_thumbnails['jpg']), 3)
+
+    def test_books_claimed_by_another_worker_are_skipped(self):
+        book = self.create_book(cover_image=cover_upload())
+        other_worker = connection.get_new_connection(connection.get_connection_params())
+        try:
+            with other_worker.cursor() as cursor:
+                cursor.execute(f'SELECT {thumbnails.CLAIM_LOCK} FROM (SELECT %s::bigint AS id) AS book', [book.pk])
+            self.assertEqual(thumbnails.process_cover_thumbnails(), (0, 0))
+        finally:
+            other_worker.close()
+
+        self.assertEqual(thumbnails.process_cover_thumbnails(), (1, 0))
+
+
+class CoverThumbnailWorkerConcurrencyTests(CoverMediaMixin, TransactionTestCase):
+
+    def test_queued_book_can_be_lent_while_the_worker_renders_its_cover(self):
+        book = self.create_book(cover_image=cover_upload())
+        user = User.objects.create_user('reader@test.com', '12345678901', 'Reader', 'One', 'secret-pass')
+        generate = thumbnails.generate_cover_thumbnails
+        outcomes = []
+
+        def checkout_from_another_connection():
+            try:
+                outcomes.append(services.checkout(user, book.pk))
+            except BookUnavailableError as e:
+                outcomes.append(e)
+            finally:
+                connection.close()
+
+        def render_during_checkout(claimed):
+            terminal = threading.Thread(target=checkout_from_another_connection)
+            terminal.start()
+            terminal.join()
+            return generate(claimed)
+
+        with patch.object(thumbnails, 'generate_cover_thumbnails', side_effect=render_during_checkout):
+            self.assertEqual(thumbnails.process_cover_thumbnails(), (1, 0))
+
+        self.assertIsInstance(outcomes[0], Loan)
+        book.refresh_from_db()
+        self.assertFalse(book.avaible)
+        self.assertEqual(len(book.cover_thumbnails['webp']), 3)
+
+
+class CoverStorageTests(CoverTestCase):
+
+    def test_identical_covers_are_stored_once(self):
+        first = self.create_book(cover_image=cover_upload('edition-1.png'))
+        second = self.create_book(isbn='2', cover_image=cover_upload('edition-2.png'))
+        other = self.create_book(isbn='3', cover_image=cover_upload(size=(400, 600)))
+
+        self.assertEqual(first.cover_image.name, second.cover_image.name)
+        self.assertNotEqual(first.cover_image.name, other.cover_image.name)
+        self.assertRegex(first.cover_image.name, r'^book_covers/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(len(list(storage.cover_storage.walk())), 2)
+
+    def test_saving_an_existing_cover_again_makes_it_recent(self):
+        name = storage.cover_storage.save('cover.png', cover_upload())
+        hour_ago = time.time() - 3600
+        os.utime(storage.cover_storage.path(name), (hour_ago, hour_ago))
+
+        # a second edition uploads the same cover, its row isn't committed yet
+        self.assertEqual(storage.cover_storage.save('edition-2.png', cover_upload()), name)
+
+        self.assertEqual(storage.collect_garbage(grace=timedelta(minutes=30)), (0, 0))
+        self.assertTrue(storage.cover_storage.exists(name))
+
+    def test_hashed_covers_are_served_as_immutable(self):
+        book = self.create_book(cover_image=cover_upload())
+
+        response = self.client.get(book.cover_image.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], storage.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+    def test_garbage_collection_keeps_referenced_and_recent_files(self):
+        kept = self.create_book(cover_image=cover_upload())
+        dropped = self.create_book(isbn='2', cover_image=cover_upload(size=(400, 600), color=(30, 30, 200, 255)))
+        thumbnails.process_cover_thumbnails()
+        dropped.delete()
+
+        self.assertEqual(storage.collect_garbage(), (0, 0))
+        out = StringIO()
+        call_command('collect_cover_garbage', '--grace', '0', '--dry-run', stdout=out)
+        self.assertIn('5 unreferenced files would be deleted', out.getvalue())
+        deleted, freed = storage.collect_garbage(grace=timedelta(0))
+
+        kept.refresh_from_db()
+        self.assertEqual(deleted, 1 + 2 * 2)  # the cover and its 160/320 px WebP and JPEG
+        self.assertGreater(freed, 0)
+        self.assertEqual(set(storage.cover_storage.walk()), storage.referenced_covers())
+        self.assertTrue(kept.cover_image.storage.exists(kept.cover_image.name))
+
+
+class CatalogueCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader@test.com', '12345678901', 'Reader', 'One', 'secret-pass')
+        cls.book = Book.objects.create(title='Dom Casmurro', author='Machado de Assis', year='1899',
+                                       genre='Romance', isbn='1')
+
+    def setUp(self):
+        cache.clear()
+
+    def queries(self, response):
+        return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+    def test_anonymous_pages_are_served_from_the_cache(self):
+        for url in (reverse('library:home'), reverse('library:book_detail', args=[self.book.pk])):
+            first = self.client.get(url)
+            second = self.client.get(url)
+
+            self.assertEqual(self.queries(first), 2)
+            self.assertEqual(self.queries(second), 0)
+            self.assertEqual(first.content, second.content)
+
+    def test_only_the_parameters_a_page_reads_tell_cached_pages_apart(self):
+        url = reverse('library:home')
+        self.client.get(url)
+
+        for params in ({'utm_source': 'newsletter'}, {'page': '7', 'x': 'junk'}):
+            self.assertEqual(self.queries(self.client.get(url, params)), 0)
+        self.assertEqual(self.queries(self.client.get(url, {'after': encode_token(['A', 1])})), 2)
+        self.assertEqual(self.queries(self.client.get(url, {'after': encode_token(['A', 1]), 'ref': 'x'})), 0)
+        detail = reverse('library:book_detail', args=[self.book.pk])
+        self.client.get(detail)
+        self.assertEqual(self.queries(self.client.get(detail, {'after': encode_token(['A', 1])})), 0)
+
+    def test_logged_in_users_get_fresh_pages_with_cached_fragments(self):
+        self.client.force_login(self.user)
+        first = self.client.get(reverse('library:home'))
+        response = self.client.get(reverse('library:home'))
+
+        self.assertContains(response, 'Dom Casmurro')
+        self.assertEqual(self.queries(response), 4)  # session, user, validator and the books
+        # the cover partial is only rendered while building the card fragment
+        self.assertIn('partials/book_cover.html', [template.name for template in first.templates])
+        self.assertNotIn('partials/book_cover.html', [template.name for template in response.templates])
+
+    def test_saving_a_book_invalidates_its_pages(self):
+        self.client.get(reverse('library:home'))
+        self.client.get(reverse('library:book_detail', args=[self.book.pk]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = 'Memórias Póstumas'
+            self.book.save()
+
+        self.assertContains(self.client.get(reverse('library:home')), 'Memórias Póstumas')
+        self.assertContains(self.client.get(reverse('library:book_detail', args=[self.book.pk])), 'Memórias Póstumas')
+
+    def test_loans_only_invalidate_the_detail_page(self):
+        self.client.get(reverse('library:home'))
+        self.client.get(reverse('library:book_detail', args=[self.book.pk]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            loan = services.checkout(self.user, self.book.pk)
+
+        self.assertEqual(self.queries(self.client.get(reverse('library:home'))), 0)
+        detail = self.client.get(reverse('library:book_detail', args=[self.book.pk]))
+        self.assertContains(detail, 'Devolução prevista')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.return_book(loan.pk)
+        self.assertNotContains(self.client.get(reverse('library:book_detail', args=[self.book.pk])),
+                               'Devolução prevista')
+
+    def test_deleting_a_book_drops_it_from_the_list(self):
+        self.assertContains(self.client.get(reverse('library:home')), 'Dom Casmurro')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+
+        self.assertNotContains(self.client.get(reverse('library:home')), 'Dom Casmurro')
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader@test.com', '12345678901', 'Reader', 'One', 'secret-pass')
+        cls.book = Book.objects.create(title='Dom Casmurro', author='Machado de Assis', year='1899',
+                                       genre='Romance', isbn='1')
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, headers={'if-none-match': response['ETag']})
+
+    def test_unchanged_pages_answer_304_without_rendering(self):
+        self.client.force_login(self.user)
+        for url in (reverse('library:home'), reverse('library:books'),
+                    reverse('library:book_detail', args=[self.book.pk])):
+            first = self.client.get(url)
+            self.assertIn('no-cache', first['Cache-Control'])
+            self.assertIn('Last-Modified', first)
+
+            with self.assertTemplateNotUsed('base_generic.html'):
+                second = self.revalidate(url, first)
+
+            self.assertEqual(second.status_code, 304)
+            self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_modified_since_is_honoured(self):
+        url = reverse('library:book_detail', args=[self.book.pk])
+        first = self.client.get(url)
+
+        response = self.client.get(url, headers={'if-modified-since': first['Last-Modified']})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_cached_anonymous_pages_revalidate_without_queries(self):
+        url = reverse('library:home')
+        first = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.revalidate(url, first)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_the_viewer(self):
+        url = reverse('library:book_detail', args=[self.book.pk])
+        anonymous = self.client.get(url)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.revalidate(url, anonymous).status_code, 200)
+
+    def test_writes_move_updated_at_and_the_etag(self):
+        detail = reverse('library:book_detail', args=[self.book.pk])
+        books = reverse('library:books')
+        self.client.force_login(self.user)
+        before = {url: self.client.get(url) for url in (detail, books)}
+        updated_at = self.book.updated_at
+
+        loan = services.checkout(self.user, self.book.pk)
+        services.renew(loan.pk)
+
+        self.book.refresh_from_db()
+        self.assertGreater(self.book.updated_at, updated_at)
+        for url, response in before.items():
+            self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_queryset_updates_and_deletions_change_the_list_etag(self):
+        Book.objects.create(title='Quincas Borba', author='Machado de Assis', year='1891', genre='Romance', isbn='2')
+        self.client.force_login(self.user)
+        url = reverse('library:home')
+
+        first = self.client.get(url)
+        Book.objects.filter(pk=self.book.pk).update(genre='Clássico')
+        second = self.client.get(url)
+        Book.objects.filter(isbn='2').delete()
+        third = self.client.get(url)
+
+        self.assertEqual(len({first['ETag'], second['ETag'], third['ETag']}), 3)
+
+    def test_catalogue_version_is_a_row_bumped_once_per_write(self):
+        version, last_modified = catalogue_version()
+        Book.objects.create(title='Quincas Borba', author='Machado de Assis', year='1891', genre='Romance', isbn='2')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(catalogue_version()[0], version + 1)
+        # a primary key read, not an aggregate over the books
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('library_book', queries[0]['sql'])
+
+        Book.objects.update(genre='Clássico')
+        self.assertEqual(catalogue_version()[0], version + 2)
+        Book.objects.filter(isbn='2').delete()
+        bumped, bumped_at = catalogue_version()
+        self.assertGreater(bumped, version + 2)
+        self.assertGreater(bumped_at, last_modified)
+
+
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_are_planned_on_their_index(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+
+        self.assertIn(f'All {len(plans.hot_queries())} hot queries are served by an index.', out.getvalue())
+
+    def test_verdict_holds_once_autovacuum_analyzed_the_empty_tables(self):
+        # the plans of the test database change once its tables have statistics
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE library_book, library_loan, users_user')
+
+        self.assertEqual(plans.check_query_plans(), {})
+
+    def test_unindexed_query_fails_the_check(self):
+        queries = plans.hot_queries() + [
+            ('books by synopsis', Book.objects.filter(synopsis='Bentinho'), False, None),
+            ('books by year', Book.objects.order_by('year')[:10], True, None),
+            ('books of an author by title', Book.objects.filter(author='Machado de Assis').order_by('title'),
+             False, 'library_book_title_id_idx'),
+        ]
+        out = StringIO()
+
+        with patch('library.management.commands.check_query_plans.hot_queries', return_value=queries):
+            with self.assertRaisesMessage(CommandError, f'3 of {len(queries)} hot queries'):
+                call_command('check_query_plans', stdout=out)
+
+        self.assertEqual(out.getvalue().splitlines(), [
+            'books by synopsis: sequential scan on library_book',
+            'books by year: sort on year; sequential scan on library_book',
+            'books of an author by title: library_book_title_id_idx not used (library_book_author_idx)',
+        ])
@@ -0,0 +1,122 @@
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+
+from .cache import invalidate_book
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+COVER_WIDTHS = tuple(getattr(settings, 'LIBRARY_COVER_WIDTHS', (160, 320, 640)))
+COVER_QUALITY = getattr(settings, 'LIBRARY_COVER_QUALITY', 80)
+# extension -> Pillow format and save options, in <source> preference order
+COVER_FORMATS = {
+    'webp': ('WEBP', {'quality': COVER_QUALITY, 'method': 6}),
+    'jpg': ('JPEG', {'quality': COVER_QUALITY, 'optimize': True, 'progressive': True}),
+}
+
+
+def thumbnail_widths(original_width):
+    # covers are never upscaled; a narrow cover gets one copy at its own width
+    return [width for width in COVER_WIDTHS if width < original_width] or [original_width]
+
+
+def render_thumbnails(image_file):
+    """Yield ``(width, extension, content)`` for every width and format"""
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            # JPEG has no alpha channel, transparent covers are laid on white
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.convert('RGBA'))
+            image = background
+        for width in thumbnail_widths(image.width):
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            for extension, (image_format, options) in COVER_FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, image_format, **options)
+                yield width, extension, buffer.getvalue()
+
+
+def generate_cover_thumbnails(book):
+    """Write the thumbnails of ``book.cover_image`` to the cover storage.
+
+    Returns the value for ``Book.cover_thumbnails``: ``{extension: [[width, name], ...]}``
+    with widths ascending.
+    """
+    storage = book.cover_image.storage
+    thumbnails = {extension: [] for extension in COVER_FORMATS}
+    with book.cover_image.open('rb') as cover:
+        for width, extension, content in render_thumbnails(cover):
+            # the cover storage names files by content and only keeps the
+            # extension of the proposed name; a rerun, or another book with
+            # the same cover, reuses the files already written
+            name = storage.save(f'thumbnail.{extension}', ContentFile(content))
+            thumbnails[extension].append([width, name])
+    return thumbnails
+
+
+# session advisory locks claiming the books of a batch, keyed by the book
+# table and the book id; unlike row locks they outlive the claiming
+# transaction, block no other writer and go away with a crashed worker
+CLAIM_LOCK = "pg_try_advisory_lock('library_book'::regclass::oid::int, id::int)"
+RELEASE_LOCK = "pg_advisory_unlock('library_book'::regclass::oid::int, id::int)"
+
+
+def claim_books(book_ids):
+    """The ids of ``book_ids`` no other worker is processing, now claimed by this one"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT id FROM unnest(%s::bigint[]) AS id WHERE {CLAIM_LOCK}', [book_ids])
+        return [book_id for book_id, in cursor.fetchall()]
+
+
+def release_books(book_ids):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {RELEASE_LOCK} FROM unnest(%s::bigint[]) AS id', [book_ids])
+
+
+def process_cover_thumbnails(batch_size=20):
+    """Generate the thumbnails of every book waiting for them.
+
+    Books whose cover was uploaded or replaced have ``cover_thumbnails`` NULL
+    and form the queue, walked once in id order. A batch is claimed with
+    advisory locks, so several workers can drain the queue together, and no
+    transaction is open while its covers are rendered: checkouts and saves of
+    those books go on meanwhile. The thumbnails are written only if the book
+    still has the cover they were made from. Covers Pillow can't read are
+    logged and get no thumbnails, the templates keep the original for them.
+    Returns the number of books processed and of covers that failed.
+    """
+    pending = (Book.objects.filter(cover_thumbnails__isnull=True).exclude(cover_image='')
+               .exclude(cover_image__isnull=True).order_by('id'))
+    processed = failed = 0
+    last_id = 0
+    while True:
+        book_ids = list(pending.filter(pk__gt=last_id).values_list('pk', flat=True)[:batch_size])
+        if not book_ids:
+            break
+        last_id = book_ids[-1]
+        claimed = claim_books(book_ids)
+        try:
+            # read again once claimed, another worker may have just finished some
+            for book in pending.filter(pk__in=claimed):
+                try:
+                    thumbnails = generate_cover_thumbnails(book)
+                except (OSError, Image.DecompressionBombError):
+                    logger.warning('Could not generate thumbnails for book %s (%s)',
+                                   book.pk, book.cover_image.name, exc_info=True)
+                    thumbnails = {}
+                    failed += 1
+                # a cover replaced meanwhile is queued again, its thumbnails are not these
+                if Book.objects.filter(pk=book.pk, cover_image=book.cover_image.name,
+                                       cover_thumbnails__isnull=True).update(cover_thumbnails=thumbnails):
+                    invalidate_book(book.pk)
+                processed += 1
+        finally:
+            release_books(claimed)
+    return processed, failed
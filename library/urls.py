@@ -2,7 +2,9 @@ from django.urls import path
 from django.conf.urls.static import static
 from django.conf import settings
 from . import views
-from .views import  BookCreateView, BookDetailView, BookDeleteView, BookHomeListView, BookAdminListView
+from .views import  BookCreateView, BookDetailView, BookDeleteView, BookHomeListView, BookAdminListView, BookSearchView
+from .views import LoanCheckoutView, LoanReturnView, LoanRenewView, serve_cover
+from .storage import cover_storage
 
 
 app_name = 'library'
@@ -10,9 +12,14 @@ app_name = 'library'
 urlpatterns = [
     path('', BookHomeListView.as_view(), name='home'),
     path('library/books/', BookAdminListView.as_view(), name='books'),
+    path('library/search/', BookSearchView.as_view(), name='search'),
     path('library/book_register/', BookCreateView.as_view(), name='book_register'),
     path('library/book/<int:pk>/', BookDetailView.as_view(), name='book_detail'),
     path('library/book/<int:pk>/delete/', BookDeleteView.as_view(), name='delete_book'),
+    path('library/book/<int:pk>/checkout/', LoanCheckoutView.as_view(), name='checkout'),
+    path('library/loan/<int:pk>/return/', LoanReturnView.as_view(), name='return_loan'),
+    path('library/loan/<int:pk>/renew/', LoanRenewView.as_view(), name='renew_loan'),
+    path(f'{settings.MEDIA_URL.lstrip("/")}{cover_storage.directory}/<path:path>', serve_cover, name='cover'),
 ]
 
 if settings.DEBUG:
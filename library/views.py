@@ -1,24 +1,76 @@
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
-from django.views.generic import CreateView, DetailView, DeleteView
+import posixpath
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponse
+from django.template.response import TemplateResponse
+from django.views import View
+from django.views.generic import CreateView, DeleteView
+from django.views.static import serve
 from django.views.generic.list import ListView
 from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages import constants
 from django.urls import reverse_lazy
 from django.db import transaction
-from .models import Book
+from .cache import CATALOGUE_GENERATION, CachedPageMixin, book_generation
+from .conditional import ConditionalGetMixin, acatalogue_version, catalogue_version
+from .exceptions import BookUnavailableError, LoanNotFoundError
+from .models import Book, Loan
 from .forms import BookForm
+from .pagination import AsyncPaginator, KeysetPaginationMixin
+from .search import search_books
+from .storage import IMMUTABLE_CACHE_CONTROL, cover_storage, is_hashed_name
+from . import services
 
 
-class BookHomeListView(ListView):
-    model = Book    
+class BookHomeListView(CachedPageMixin, ConditionalGetMixin, KeysetPaginationMixin, View):
+    # async read path: under ASGI the worker isn't held while the query runs
     template_name = 'home.html'
+    cache_params = ('after', 'before')
+
+    async def get(self, request):
+        return await self.cached_page(request, CATALOGUE_GENERATION, self.conditional_page)
+
+    async def conditional_page(self):
+        version, last_modified = await acatalogue_version()
+        return await self.aconditional(self.request, version, last_modified, self.render_page)
+
+    async def render_page(self):
+        _, page, rows, is_paginated = await self.apaginate_queryset(Book.objects.all(), self.paginate_by)
+        return TemplateResponse(self.request, self.template_name, {
+            'object_list': rows, 'book_list': rows, 'page_obj': page, 'is_paginated': is_paginated,
+            'cache_timeout': self.cache_timeout,
+        })
 
 
-class BookAdminListView(ListView):
-    model = Book    
+class BookAdminListView(ConditionalGetMixin, KeysetPaginationMixin, ListView):
+    model = Book
     template_name = 'books.html'
 
+    def get(self, request, *args, **kwargs):
+        version, last_modified = catalogue_version()
+        return self.conditional(request, version, last_modified,
+                                lambda: super(BookAdminListView, self).get(request, *args, **kwargs))
+
+    def get_queryset(self):
+        # loan dates come with the books in the same query
+        return super().get_queryset().select_related('current_loan')
+
+
+class BookSearchView(View):
+    template_name = 'search.html'
+    paginate_by = 20
+
+    async def get(self, request):
+        query = request.GET.get('q', '')
+        paginator = AsyncPaginator(search_books(query), self.paginate_by)
+        page = await paginator.apage(request.GET.get('page') or 1)
+        return TemplateResponse(request, self.template_name, {
+            'query': query, 'object_list': page.object_list, 'page_obj': page, 'paginator': paginator,
+            'is_paginated': page.has_other_pages(),
+        })
+
 
 class BookCreateView(CreateView):
     model = Book
@@ -32,10 +84,27 @@ class BookCreateView(CreateView):
         return super().form_valid(form)
 
 
-class BookDetailView(DetailView):
-    model = Book
+class BookDetailView(CachedPageMixin, ConditionalGetMixin, View):
     template_name = 'book_details.html'
-    context_object_name = 'book'
+
+    async def get(self, request, pk):
+        return await self.cached_page(request, book_generation(pk), lambda: self.conditional_page(pk))
+
+    async def conditional_page(self, pk):
+        updated_at = await Book.objects.filter(pk=pk).values_list('updated_at', flat=True).afirst()
+        return await self.aconditional(self.request, updated_at and updated_at.isoformat(), updated_at,
+                                       lambda: self.render_page(pk))
+
+    async def render_page(self, pk):
+        # the loan and its user come in the same query as the book
+        try:
+            book = await Book.objects.select_related('current_loan__user').aget(pk=pk)
+        except Book.DoesNotExist:
+            raise Http404('Livro não encontrado.')
+        return TemplateResponse(self.request, self.template_name, {
+            'object': book, 'book': book, 'active_loan': book.current_loan,
+            'cache_timeout': self.cache_timeout,
+        })
 
 
 class BookDeleteView(DeleteView):
@@ -46,4 +115,66 @@ class BookDeleteView(DeleteView):
     @transaction.atomic
     def form_valid(self, form):
         messages.add_message(self.request, constants.SUCCESS, 'Livro deletado com sucesso!')
-        return super().form_valid(form)
\ No newline at end of file
+        return super().form_valid(form)
+
+
+def serve_cover(request, path):
+    # content-hashed covers never change under the same URL
+    name = posixpath.join(cover_storage.directory, path)
+    response = serve(request, name, document_root=cover_storage.location)
+    if is_hashed_name(name):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+class LoanCheckoutView(LoginRequiredMixin, View):
+
+    def post(self, request, pk):
+        # staff at the desk may lend to another user by e-mail
+        user = request.user
+        email = request.POST.get('email', '').strip()
+        if email and request.user.is_staff:
+            user = get_user_model().objects.filter(email=email).first()
+            if user is None:
+                messages.add_message(request, constants.ERROR, f'Usuário {email} não encontrado.')
+                return redirect('library:book_detail', pk=pk)
+        try:
+            loan = services.checkout(user, pk)
+        except BookUnavailableError as e:
+            messages.add_message(request, constants.ERROR, e.message)
+        else:
+            messages.add_message(request, constants.SUCCESS,
+                                 f'Empréstimo registrado! Devolução até {loan.return_date:%d/%m/%Y}.')
+        return redirect('library:book_detail', pk=pk)
+
+
+def managed_loans(user):
+    # borrowers return and renew their own loans, staff at the desk anyone's
+    return Loan.objects.all() if user.is_staff else Loan.objects.filter(user=user)
+
+
+class LoanReturnView(LoginRequiredMixin, View):
+
+    def post(self, request, pk):
+        loan = get_object_or_404(managed_loans(request.user), pk=pk)
+        try:
+            services.return_book(loan.pk)
+        except LoanNotFoundError as e:
+            messages.add_message(request, constants.ERROR, e.message)
+        else:
+            messages.add_message(request, constants.SUCCESS, 'Livro devolvido com sucesso!')
+        return redirect('library:book_detail', pk=loan.book_id)
+
+
+class LoanRenewView(LoginRequiredMixin, View):
+
+    def post(self, request, pk):
+        loan = get_object_or_404(managed_loans(request.user), pk=pk)
+        try:
+            loan = services.renew(loan.pk)
+        except LoanNotFoundError as e:
+            messages.add_message(request, constants.ERROR, e.message)
+        else:
+            messages.add_message(request, constants.SUCCESS,
+                                 f'Empréstimo renovado até {loan.return_date:%d/%m/%Y}.')
+        return redirect('library:book_detail', pk=loan.book_id)
@@ -0,0 +1,225 @@
+"""Non-interactive import and export of the books and users tables.
+
+    python -m library_cli import books.csv
+    python -m library_cli export users.jsonl
+    python -m library_cli import books.csv --resume
+
+The table is taken from the file name (books.* / users.*) unless --table is
+given, and the format from the extension (.csv / .jsonl). Rows are streamed
+through generators so memory stays bounded, progress is checkpointed after
+every batch and --resume continues from the last checkpoint.
+
+    python -m library_cli export books.csv --order-by title,author
+
+--order-by sorts an export by the given columns (id by default); the
+checkpoint records the ordering and the last row written, so --resume picks
+up after that row whatever the order.
+
+    python -m library_cli export books.csv --metrics metrics.prom
+
+--metrics records the controller calls of the run and writes them as a
+Prometheus text dump, or as JSON with --metrics-format json.
+"""
+from Controllers.controllers import BookController, UserController, keyset_order
+from Controllers.metrics import registry
+import argparse, csv, itertools, json, os, sys, time
+
+FIELDS = {
+    'books': ['title', 'author', 'year', 'genre', 'isbn_code'],
+    'users': ['name', 'email', 'phone', 'user_code'],
+}
+
+
+def detect_table(path, table=None):
+    table = table or os.path.basename(path).split('.')[0]
+    if table not in FIELDS:
+        raise ValueError(f'Unknown table "{table}", use --table books or --table users')
+    return table
+
+
+def detect_format(path, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f'Unknown format "{fmt}", use --format csv or --format jsonl')
+    return fmt
+
+
+def read_records(path, fmt):
+    with open(path, newline='', encoding='utf-8') as file:
+        if fmt == 'csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_row(table, record):
+    row = tuple(record.get(field) for field in FIELDS[table])
+    if table == 'books':
+        return tuple(str(value) if value is not None else None for value in row)
+    name, email, phone, user_code = row
+    if isinstance(user_code, str) and user_code.isnumeric():
+        user_code = int(user_code)
+    return name, email, str(phone) if phone is not None else None, user_code
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_checkpoint(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def print_progress(table, rows, started):
+    elapsed = time.monotonic() - started
+    rate = rows / elapsed if elapsed else 0
+    print(f'{table}: {rows} rows, {rate:.0f} rows/s', file=sys.stderr)
+    return rate
+
+
+def import_file(path, table, fmt, batch_size=5000, checkpoint_path=None, resume=False,
+                rejects_path=None, controller=None):
+    checkpoint_path = checkpoint_path or f'{path}.checkpoint'
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    done = checkpoint['rows'] if checkpoint else 0
+    if controller is None:
+        controller = BookController() if table == 'books' else UserController()
+    bulk_load = controller.bulk_add_books if table == 'books' else controller.bulk_register_users
+
+    accepted = rejected = 0
+    rate = 0
+    started = time.monotonic()
+    records = itertools.islice(read_records(path, fmt), done, None)
+    rejects = open(rejects_path, 'a' if resume else 'w', encoding='utf-8') if rejects_path else None
+    try:
+        for batch in batched((to_row(table, record) for record in records), batch_size):
+            report = bulk_load(batch, batch_size=batch_size)
+            for position, code, reason in report['rejected']:
+                line = done + position + 1
+                if rejects:
+                    rejects.write(json.dumps({'row': line, 'code': code, 'reason': reason}) + '\n')
+                else:
+                    print(f'Row {line} ({code}) rejected: {reason}', file=sys.stderr)
+            accepted += len(report['accepted'])
+            rejected += len(report['rejected'])
+            done += len(batch)
+            save_checkpoint(checkpoint_path, {'rows': done})
+            rate = print_progress(table, done, started)
+    finally:
+        if rejects:
+            rejects.close()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return {'rows': done, 'accepted': accepted, 'rejected': rejected, 'rows_per_second': rate}
+
+
+def export_file(path, table, fmt, itersize=2000, checkpoint_path=None, resume=False, controller=None,
+                order_by='id'):
+    checkpoint_path = checkpoint_path or f'{path}.checkpoint'
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    controller_class = BookController if table == 'books' else UserController
+    if controller is None:
+        controller = controller_class()
+    iter_rows = controller.iter_books if table == 'books' else controller.iter_users
+    fields = FIELDS[table]
+
+    done = checkpoint['rows'] if checkpoint else 0
+    # a resumed export keeps the ordering it started with, the checkpointed
+    # row is only a position in that one
+    order_by = keyset_order(checkpoint['order_by'] if checkpoint else order_by, controller_class.unique_columns)
+    after = checkpoint['after'] if checkpoint else None
+    exported = rate = 0
+    started = time.monotonic()
+    with open(path, 'a' if checkpoint else 'w', newline='', encoding='utf-8') as file:
+        if checkpoint:
+            # drop anything written after the last checkpoint
+            file.truncate(checkpoint['offset'])
+            file.seek(checkpoint['offset'])
+        writer = csv.writer(file) if fmt == 'csv' else None
+        if writer and not checkpoint:
+            writer.writerow(fields)
+
+        for row in iter_rows(after=after, itersize=itersize, order_by=order_by):
+            values = [getattr(row, field) for field in fields]
+            if writer:
+                writer.writerow(values)
+            else:
+                file.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False) + '\n')
+            after = [getattr(row, column) for column in order_by]
+            exported += 1
+            if exported % itersize == 0:
+                file.flush()
+                save_checkpoint(checkpoint_path, {'rows': done + exported, 'order_by': list(order_by),
+                                                  'after': after, 'offset': file.tell()})
+                rate = print_progress(table, done + exported, started)
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    rate = print_progress(table, done + exported, started) if exported else rate
+    return {'rows': done + exported, 'rows_per_second': rate}
+
+
+def write_metrics(path, fmt):
+    dump = registry.to_json() + '\n' if fmt == 'json' else registry.to_prometheus()
+    if path == '-':
+        sys.stdout.write(dump)
+        return
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(dump)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='library_cli', description='Import or export books and users.')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path', help='CSV or JSONL file to read from or write to')
+    parser.add_argument('--table', choices=sorted(FIELDS), help='defaults to the file name')
+    parser.add_argument('--format', dest='fmt', choices=['csv', 'jsonl'], help='defaults to the file extension')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per write (import) or fetch (export)')
+    parser.add_argument('--checkpoint', help='checkpoint file, defaults to <path>.checkpoint')
+    parser.add_argument('--resume', action='store_true', help='continue from the last checkpoint')
+    parser.add_argument('--order-by', default='id', type=lambda value: tuple(value.split(',')),
+                        help='comma separated columns an export is sorted by, defaults to id')
+    parser.add_argument('--rejects', help='JSONL file receiving the rejected rows of an import')
+    parser.add_argument('--metrics', help='file receiving the controller metrics of the run, - for stdout')
+    parser.add_argument('--metrics-format', choices=['prometheus', 'json'], default='prometheus')
+    args = parser.parse_args(argv)
+    if args.metrics:
+        registry.enable()
+
+    try:
+        table = detect_table(args.path, args.table)
+        fmt = detect_format(args.path, args.fmt)
+        if args.command == 'import':
+            summary = import_file(args.path, table, fmt, args.batch_size, args.checkpoint, args.resume, args.rejects)
+            print(f"Imported {summary['accepted']} {table}, rejected {summary['rejected']} "
+                  f"({summary['rows_per_second']:.0f} rows/s).")
+        else:
+            summary = export_file(args.path, table, fmt, args.batch_size, args.checkpoint, args.resume,
+                                  order_by=args.order_by)
+            print(f"Exported {summary['rows']} {table} ({summary['rows_per_second']:.0f} rows/s).")
+    except Exception as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    finally:
+        if args.metrics:
+            write_metrics(args.metrics, args.metrics_format)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('library_management_web.performance')
+
+# timer of the request being served; a context variable so async requests
+# sharing a thread, and ORM calls run in sync_to_async threads, are
+# attributed to the right request
+current_timer = ContextVar('current_timer', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a view runs more queries than its budget"""
+
+    def __init__(self, view_name, queries, budget):
+        self.view_name = view_name
+        self.queries = queries
+        self.budget = budget
+        self.message = f"{self.view_name} ran {self.queries} queries, budget is {self.budget}."
+        super().__init__(self.message)
+
+
+class DatabaseTimer:
+    """Query count and duration of a request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.duration += time.perf_counter() - started
+        timer.queries += 1
+
+
+def install_query_recorder():
+    # connections are per thread, the recorder stays on them once added; it
+    # goes first so execute_wrapper() blocks still pop their own wrapper
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, record_query)
+
+
+class QueryTimingMiddleware:
+    """Measures query count, DB time, template render time and total latency.
+
+    The numbers go to the Server-Timing header and, as one JSON line per
+    request, to the ``library_management_web.performance`` logger, at INFO
+    so they only show when that logger is lowered to it. Views running more
+    queries than ``QUERY_BUDGETS[view_name]`` (or ``DEFAULT_QUERY_BUDGET``)
+    are logged as warnings, or raise QueryBudgetExceeded when
+    ``QUERY_BUDGET_STRICT`` is on.
+
+    Works in both modes so async views under ASGI keep running on the event
+    loop; their ORM calls are counted in the sync_to_async thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        install_query_recorder()
+        timer = DatabaseTimer()
+        token = current_timer.set(timer)
+        request.render_timing = [None, None]
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        self.finish(request, response, timer, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        await sync_to_async(install_query_recorder)()
+        timer = DatabaseTimer()
+        token = current_timer.set(timer)
+        request.render_timing = [None, None]
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        self.finish(request, response, timer, time.perf_counter() - started)
+        return response
+
+    def finish(self, request, response, timer, total):
+        render_started, render_finished = request.render_timing
+        render = render_finished - render_started if render_finished is not None else None
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        self.report(request, response, view_name, timer, render, total)
+
+    def process_template_response(self, request, response):
+        # TemplateResponses are rendered right after this hook returns
+        request.render_timing[0] = time.perf_counter()
+
+        def finished(response):
+            request.render_timing[1] = time.perf_counter()
+        response.add_post_render_callback(finished)
+        return response
+
+    def report(self, request, response, view_name, timer, render, total):
+        timings = [f'db;dur={timer.duration * 1000:.1f};desc="{timer.queries} queries"']
+        if render is not None:
+            timings.append(f'render;dur={render * 1000:.1f}')
+        timings.append(f'total;dur={total * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(view_name, getattr(settings, 'DEFAULT_QUERY_BUDGET', None))
+        over_budget = budget is not None and timer.queries > budget
+        record = {
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timer.queries,
+            'db_ms': round(timer.duration * 1000, 1),
+            'render_ms': round(render * 1000, 1) if render is not None else None,
+            'total_ms': round(total * 1000, 1),
+            'query_budget': budget,
+            'over_budget': over_budget,
+        }
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record))
+        if over_budget and getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(view_name, timer.queries, budget)
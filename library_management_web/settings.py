@@ -28,11 +28,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users',
     'library',
 ]
 
 MIDDLEWARE = [
+    'library_management_web.middleware.QueryTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +80,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Holds the catalogue pages and book fragments (library.cache). Local memory is
+# private to each process; with several processes or the thumbnail worker on
+# one node, PAGE_CACHE_DIR switches to files they all share and invalidate.
+
+PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR')
+
+CACHES = {
+    'default': {
+        'BACKEND': ('django.core.cache.backends.filebased.FileBasedCache' if PAGE_CACHE_DIR
+                    else 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': PAGE_CACHE_DIR or 'library-catalogue',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('PAGE_CACHE_MAX_ENTRIES', 10000))},
+    }
+}
+LIBRARY_CATALOGUE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 3600))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -142,4 +163,40 @@ MESSAGE_TAGS = {
     constants.INFO: 'alert-info',
     constants.SUCCESS: 'alert-success',
     constants.WARNING: 'alert-warning',
-}
\ No newline at end of file
+}
+
+
+# Per request performance instrumentation (library_management_web.middleware)
+# Query budgets are keyed by view name; requests above it are logged as warnings
+# and, with QUERY_BUDGET_STRICT, raise so N+1 regressions fail the tests.
+# Logged in requests pay two extra queries for the session and the user, and
+# the list and detail pages a primary key read of the version their
+# conditional GETs compare (the catalogue version row, the book's updated_at).
+
+QUERY_BUDGETS = {
+    'library:home': 4,
+    'library:books': 4,
+    'library:book_detail': 4,
+    'library:search': 4,
+}
+DEFAULT_QUERY_BUDGET = 20
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', '') == '1'
+
+# The performance logger only prints the requests over their query budget;
+# PERFORMANCE_LOG_LEVEL=INFO adds one JSON line per request.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'library_management_web.performance': {
+            'handlers': ['console'],
+            'level': os.getenv('PERFORMANCE_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
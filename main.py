@@ -6,7 +6,8 @@ book_options = {
     '2': views.show_books,
     '3': views.search_book,
     '4': views.update_book,
-    '5': views.delete_book
+    '5': views.delete_book,
+    '6': views.search_book_by_text
 }
 
 user_options = {
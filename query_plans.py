@@ -0,0 +1,24 @@
+"""Reading of EXPLAIN (FORMAT JSON) plans, shared by the plan checks of the
+controllers (Controllers/plans.py) and of the site (library/plans.py)."""
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def plan_problems(plan, ordered=False, index=None):
+    """Seq Scan nodes of a plan, Sort nodes if ``ordered`` and the absence of ``index``, if given"""
+    problems = []
+    indexes = set()
+    for node in plan_nodes(plan):
+        if node['Node Type'] == 'Seq Scan':
+            problems.append(f"sequential scan on {node['Relation Name']}")
+        elif ordered and node['Node Type'] == 'Sort':
+            problems.append(f"sort on {', '.join(node['Sort Key'])}")
+        if 'Index Name' in node:
+            indexes.add(node['Index Name'])
+    if index is not None and index not in indexes:
+        problems.append(f"{index} not used ({', '.join(sorted(indexes)) or 'no index'})")
+    return problems
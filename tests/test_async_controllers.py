@@ -0,0 +1,154 @@
+from Controllers.async_controllers import AsyncBookController, AsyncUserController
+from Exceptions.exceptions import DuplicateError, EmailFormatError, PoolTimeoutError
+from async_db_connection import acquire, close_async_pool, get_async_pool
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio, asyncpg, gc, unittest, weakref
+
+
+class AsyncControllerTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.conn = AsyncMock()
+
+        @asynccontextmanager
+        async def fake_acquire():
+            yield self.conn
+        patcher = patch('Controllers.async_controllers.acquire', fake_acquire)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestAsyncBookController(AsyncControllerTestCase):
+
+    async def test_add_book_passes_year_as_integer(self):
+        self.conn.fetchval.return_value = 1
+
+        result = await AsyncBookController().add_book('Title', 'Author', '1990', 'Genre', '123')
+
+        self.assertEqual(result, "Success! Book registered!")
+        self.assertEqual(self.conn.fetchval.call_args.args[1:], ('Title', 'Author', 1990, 'Genre', '123'))
+
+    async def test_add_book_raises_duplicate_error_on_conflict(self):
+        self.conn.fetchval.return_value = None
+
+        with self.assertRaises(DuplicateError):
+            await AsyncBookController().add_book('Title', 'Author', '1990', 'Genre', '123')
+
+    async def test_add_book_validates_before_querying(self):
+        with self.assertRaises(ValueError):
+            await AsyncBookController().add_book('Title', 'Author', '1990', 'Genre', 'abc')
+        self.conn.fetchval.assert_not_called()
+
+    async def test_get_many_fetches_missing_codes_in_one_query(self):
+        controller = AsyncBookController()
+        controller.cache.set('1', (1, 'Cached', 'Author', 1990, 'Genre', '1'))
+        self.conn.fetch.return_value = [(2, 'Title', 'Author', 1990, 'Genre', '2')]
+
+        result = await controller.get_many(['1', 2, '3', '2'])
+
+        self.conn.fetch.assert_awaited_once()
+        self.assertEqual(self.conn.fetch.call_args.args[1], ['2', '3'])
+        self.assertEqual(list(result), ['1', '2', '3'])
+        self.assertEqual(result['1'][1], 'Cached')
+        self.assertEqual(result['2'].title, 'Title')
+        self.assertIsNone(result['3'])
+
+    async def test_concurrent_lookups_are_served_from_the_cache(self):
+        controller = AsyncBookController()
+        self.conn.fetchrow.return_value = (1, 'Title', 'Author', 1990, 'Genre', '123')
+
+        await controller.search_by_book_code('123')
+        await asyncio.gather(*(controller.search_by_book_code('123') for _ in range(10)))
+
+        self.conn.fetchrow.assert_awaited_once()
+
+    async def test_update_and_delete_report_missing_books(self):
+        self.conn.execute.return_value = 'UPDATE 0'
+        self.assertIsNone(await AsyncBookController().update_book('123', 'Title', 'Author', '1990', 'Genre'))
+
+        self.conn.execute.return_value = 'DELETE 1'
+        self.assertTrue(await AsyncBookController().delete_book('123'))
+
+
+class TestAsyncUserController(AsyncControllerTestCase):
+
+    async def test_register_user_raises_duplicate_error_on_conflict(self):
+        self.conn.fetchval.return_value = None
+
+        with self.assertRaises(DuplicateError):
+            await AsyncUserController().register_user('Name', 'a@b.com', '11999994444', 1000)
+
+    async def test_register_user_raises_duplicate_error_on_a_taken_email(self):
+        self.conn.fetchval.side_effect = asyncpg.UniqueViolationError('users_email_key')
+
+        with self.assertRaises(DuplicateError):
+            await AsyncUserController().register_user('Name', 'a@b.com', '11999994444', 1000, upsert=True)
+
+    async def test_register_user_validates_email(self):
+        with self.assertRaises(EmailFormatError):
+            await AsyncUserController().register_user('Name', 'not-an-email', '11999994444', 1000)
+
+    async def test_get_many_returns_none_for_unknown_codes(self):
+        self.conn.fetch.return_value = [(1, 'Name', 'a@b.com', '11999994444', 1000)]
+
+        result = await AsyncUserController().get_many(['1000', 2000])
+
+        self.assertEqual(self.conn.fetch.call_args.args[1], [1000, 2000])
+        self.assertIsNone(result[2000])
+        self.assertEqual(result[1000].email, 'a@b.com')
+
+
+class TestAsyncPool(unittest.IsolatedAsyncioTestCase):
+
+    async def test_acquire_raises_pool_timeout_error(self):
+        pool = MagicMock()
+        pool.acquire = AsyncMock(side_effect=asyncio.TimeoutError)
+        pool.get_max_size.return_value = 10
+
+        with patch('async_db_connection.get_async_pool', AsyncMock(return_value=pool)):
+            with self.assertRaises(PoolTimeoutError):
+                async with acquire():
+                    pass
+
+    async def test_acquire_releases_the_connection(self):
+        pool = MagicMock()
+        pool.acquire = AsyncMock(return_value='conn')
+        pool.release = AsyncMock()
+
+        with patch('async_db_connection.get_async_pool', AsyncMock(return_value=pool)):
+            with self.assertRaises(RuntimeError):
+                async with acquire() as conn:
+                    raise RuntimeError(conn)
+
+        pool.release.assert_awaited_once_with('conn')
+
+    async def test_concurrent_callers_share_the_pool_of_their_loop(self):
+        pool = MagicMock()
+        pool.close = AsyncMock()
+
+        with patch('async_db_connection._create_pool', AsyncMock(return_value=pool)) as create_pool:
+            pools = await asyncio.gather(get_async_pool(), get_async_pool())
+            await close_async_pool()
+            await get_async_pool()
+
+        self.assertEqual(pools, [pool, pool])
+        pool.close.assert_awaited_once()
+        self.assertEqual(create_pool.await_count, 2)
+
+
+class TestAsyncPoolLifetime(unittest.TestCase):
+
+    def test_closed_loops_are_collected_with_their_pool(self):
+        loops = []
+
+        async def use_pool():
+            loops.append(weakref.ref(asyncio.get_running_loop()))
+            await get_async_pool()
+
+        with patch('async_db_connection._create_pool', AsyncMock(side_effect=lambda: MagicMock())):
+            for _ in range(3):
+                asyncio.run(use_pool())
+        gc.collect()
+
+        self.assertEqual([loop() for loop in loops], [None, None, None])
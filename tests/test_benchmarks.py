@@ -0,0 +1,40 @@
+from benchmarks.bench_records import run as run_records
+from benchmarks.compare import compare
+from benchmarks.timing import measure, summarize
+import unittest
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_summarize_reports_percentiles_in_milliseconds(self):
+        summary = summarize([n / 1000 for n in range(1, 101)])
+
+        self.assertEqual(summary['runs'], 100)
+        self.assertEqual(summary['p50_ms'], 51.0)
+        self.assertEqual(summary['p95_ms'], 96.0)
+        self.assertEqual(summary['max_ms'], 100.0)
+
+    def test_measure_drops_the_warmup_calls(self):
+        calls = []
+
+        summary = measure(calls.append, 3, warmup=2)
+
+        self.assertEqual(calls, [0, 1, 2, 3, 4])
+        self.assertEqual(summary['runs'], 3)
+
+    def test_compare_reports_the_relative_change(self):
+        before = {'sizes': {'10': {'views': {'home': {'p50_ms': 2.0, 'queries': 1}}}}}
+        after = {'sizes': {'10': {'views': {'home': {'p50_ms': 1.0, 'queries': 1}},
+                                  'controllers': {'add_book': {'p50_ms': 0.5}}}}}
+
+        rows = compare(before, after)
+
+        self.assertIn(['10', 'views', 'home', 'p50_ms', 2.0, 1.0, '-50.0%'], rows)
+        self.assertIn(['10', 'views', 'home', 'queries', 1, 1, '+0.0%'], rows)
+        self.assertIn(['10', 'controllers', 'add_book', 'p50_ms', None, 0.5, ''], rows)
+
+    def test_records_report_memory_per_row_for_each_representation(self):
+        report = run_records(100)
+
+        self.assertEqual(set(report), {'tuple', 'record', 'dict', 'plain_class'})
+        self.assertLess(report['record']['bytes_per_row'], report['dict']['bytes_per_row'])
@@ -0,0 +1,44 @@
+from Controllers.cache import LRUCache
+from unittest.mock import patch
+import unittest
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_get_counts_hits_and_misses(self):
+        cache = LRUCache(maxsize=10, ttl=60)
+        cache.set('123', ('book',))
+
+        self.assertEqual(cache.get('123'), ('book',))
+        self.assertIsNone(cache.get('456'))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 10})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('Controllers.cache.time.monotonic')
+    def test_entries_expire_after_ttl(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        cache = LRUCache(maxsize=2, ttl=5)
+        cache.set('a', 1)
+
+        mock_monotonic.return_value = 106
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_delete_invalidates_the_entry(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.delete('a')
+        cache.delete('missing')
+
+        self.assertIsNone(cache.get('a'))
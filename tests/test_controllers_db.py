@@ -1,9 +1,11 @@
-from Models.models import User
-from Controllers.controllers import BookController, UserController
+from Models.models import Book, User
+from Controllers.controllers import BookController, UserController, BookCursor
+from Controllers.statements import STATEMENTS
 from Exceptions.exceptions import DuplicateError, LenOfPhoneError, EmailFormatError
 from unittest.mock import patch, MagicMock
 from unittest import mock
-import pytest, unittest
+from datetime import datetime
+import psycopg2, pytest, unittest
 
 
 class TestBookController(unittest.TestCase):
@@ -16,16 +18,15 @@ class TestBookController(unittest.TestCase):
             controller = BookController()
 
     @patch('Controllers.controllers.get_connection')
-    @patch('Controllers.controllers.BookController.search_by_book_code')
-    def test_add_book_with_valid_data(self, mock_search_by_book_code, mock_get_connection):
-        mock_search_by_book_code.return_value = None
-
+    def test_add_book_with_valid_data(self, mock_get_connection):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
 
-        mock_conn.__enter__.return_value = mock_conn # Simula "with self.conn"
-        mock_conn.cursor.return_value.__enter__.return_value =  mock_cursor # Simula "with self.conn.cursor()"
-        mock_get_connection.return_value = mock_conn # Simula "self.conn = get_connection()"
+        mock_conn.__enter__.return_value = mock_conn # Simula "with get_connection() as conn"
+        mock_conn.cursor.return_value.__enter__.return_value =  mock_cursor # Simula "with conn.cursor()"
+        mock_get_connection.return_value = mock_conn # Simula "get_connection()"
+
+        mock_cursor.fetchone.return_value = (1, )
 
         controller = BookController()
 
@@ -33,21 +34,53 @@ class TestBookController(unittest.TestCase):
 
         self.assertEqual(result, "Success! Book registered!")
 
-        mock_cursor.execute.assert_called_once_with(
-            "INSERT INTO books (title, author, year, genre, isbn_code) VALUES (%s, %s, %s, %s, %s);",
+        mock_cursor.execute.assert_called_with("EXECUTE insert_book (%s, %s, %s, %s, %s)",
             ('Title', 'Author', 1990, 'Genre', '123456')
             )
-        
-    @patch('Controllers.controllers.BookController.search_by_book_code')
-    def test_add_book_raises_duplicate_book_error_when_isbn_code_alredy_registered(self, mock_search_by_book_code):
-        mock_search_by_book_code.return_value = ('Some Title', 'Some Author', 1900, 'Some Genre', '789465')
+
+    @patch('Controllers.controllers.get_connection')
+    def test_add_book_raises_duplicate_book_error_when_isbn_code_alredy_registered(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        mock_cursor.fetchone.return_value = None  # ON CONFLICT DO NOTHING returned no row
 
         controller = BookController()
 
         with pytest.raises(DuplicateError):
             controller.add_book('Some Title', 'Some Author', 1900, 'Some Genre', '789465')
 
-    def test_add_book_raises_ValueError_if_any_field_is_empty(self):
+    @patch('Controllers.controllers.get_connection')
+    def test_add_book_with_upsert_updates_the_existing_book(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        mock_cursor.fetchone.return_value = (1, )
+
+        controller = BookController()
+        result = controller.add_book('Some Title', 'Some Author', 1900, 'Some Genre', '789465', upsert=True)
+
+        query = mock_cursor.execute.call_args[0][0]
+        self.assertTrue(query.startswith('EXECUTE upsert_book '))
+        self.assertEqual(result, "Success! Book registered!")
+
+    @patch('Controllers.controllers.get_connection')
+    def test_add_book_raises_ValueError_if_any_field_is_empty(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
         controller = BookController()
 
         test_data = [
@@ -58,13 +91,19 @@ class TestBookController(unittest.TestCase):
         ('Some Title', 'Some Author', '1234', 'Some Genre', '')  # code is empty
         ]   
         for title, author, year, genre, code in test_data:
-            with patch('Controllers.controllers.BookController.search_by_book_code') as mock_search_by_book_code:
-                mock_search_by_book_code.return_value = None
-                
-                with pytest.raises(ValueError):
-                    controller.add_book(title, author, year, genre, code)
+            with pytest.raises(ValueError):
+                controller.add_book(title, author, year, genre, code)
+        mock_cursor.execute.assert_not_called()
+
+    @patch('Controllers.controllers.get_connection')
+    def test_add_book_raises_ValueError_if_year_or_book_are_not_numeric(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
 
-    def test_add_book_raises_ValueError_if_year_or_book_are_not_numeric(self):
         controller = BookController()
 
         test_data = [
@@ -74,13 +113,19 @@ class TestBookController(unittest.TestCase):
         ]
 
         for title, author, year, genre, code in test_data:
-            with patch('Controllers.controllers.BookController.search_by_book_code') as mock_search_by_book_code:
-                mock_search_by_book_code.return_value = None
+            with pytest.raises(ValueError):
+                controller.add_book(title, author, year, genre, code)
+        mock_cursor.execute.assert_not_called()
 
-                with pytest.raises(ValueError):
-                    controller.add_book(title, author, year, genre, code)
+    @patch('Controllers.controllers.get_connection')
+    def test_add_book_raises_ValueError_if_title_author_or_genre_are_not_strings(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
 
-    def test_add_book_raises_ValueError_if_title_author_or_genre_are_not_strings(self):
         controller = BookController()
         
         test_data = [
@@ -90,26 +135,180 @@ class TestBookController(unittest.TestCase):
         ]
 
         for title, author, year, genre, code in test_data:
-            with patch('Controllers.controllers.BookController.search_by_book_code') as mock_search_by_book_code:
-                mock_search_by_book_code.return_value = None
-                with pytest.raises(ValueError):
-                    controller.add_book(title, author, year, genre, code)
+            with pytest.raises(ValueError):
+                controller.add_book(title, author, year, genre, code)
+        mock_cursor.execute.assert_not_called()
+
+    @patch('Controllers.controllers.get_connection')
+    def test_add_book_raises_ValueError_if_year_doesnt_less_than_or_equal_current_year(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
 
-    def test_add_book_raises_ValueError_if_year_doesnt_less_than_or_equal_current_year(self):
         controller = BookController()
-        with patch('Controllers.controllers.BookController.search_by_book_code') as mock_search_by_book_code:
-            mock_search_by_book_code.return_value = None
-            with pytest.raises(ValueError):
-                controller.add_book('Some Title', 'Some Author', '2025', 'Some Genre', '4341312')
+        next_year = str(datetime.now().year + 1)
+
+        with pytest.raises(ValueError):
+            controller.add_book('Some Title', 'Some Author', next_year, 'Some Genre', '4341312')
+        mock_cursor.execute.assert_not_called()
+
+    @patch('Controllers.controllers.get_connection')
+    def test_add_book_raises_ValueError_if_digits_in_year_field_are_less_than_3(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
 
-    def test_add_book_raises_ValueError_if_digits_in_year_field_are_less_than_3(self):
         controller = BookController()
-        with patch('Controllers.controllers.BookController.search_by_book_code') as mock_search_by_book_code:
-            mock_search_by_book_code.return_value = None
+
         with pytest.raises(ValueError):
             controller.add_book(
                 'Some Title', 'Some Author', '99', 'Some Genre', '123456')
+        mock_cursor.execute.assert_not_called()
     
+    @patch('Controllers.controllers.get_connection')
+    def test_bulk_add_books_copies_valid_rows_and_reports_rejected_ones(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        mock_cursor.fetchall.return_value = [('222',)]  # already registered
+
+        books = [
+            ('Title', 'Author', '1990', 'Genre', '111'),
+            ('Other Title', 'Other Author', '1990', 'Genre', '222'),  # duplicated in the table
+            ('123456', 'Author', '1990', 'Genre', '333'),  # numeric title
+            ('Again', 'Author', '1990', 'Genre', '111'),  # duplicated in the batch
+            ('Title, with comma', 'Author', '1985', 'Genre', '444'),
+            (None, 'Author', '1990', 'Genre', '555'),  # missing title
+            (1984, 'Orwell', '1949', 'Genre', '666'),  # JSON number as title
+            ('Title', 'Author', '1990', 'Genre', 777),  # JSON number as ISBN
+        ]
+
+        controller = BookController()
+        report = controller.bulk_add_books(books)
+
+        self.assertEqual(report['accepted'], [(0, '111'), (4, '444')])
+        self.assertEqual([(position, code) for position, code, _ in report['rejected']],
+                         [(2, '333'), (3, '111'), (5, '555'), (6, '666'), (7, 777), (1, '222')])
+        mock_cursor.execute.assert_called_once_with(
+            "SELECT isbn_code FROM books WHERE isbn_code = ANY(%s);", (['111', '222', '444'], ))
+        query, buffer = mock_cursor.copy_expert.call_args[0]
+        self.assertEqual(query, "COPY books (title, author, year, genre, isbn_code) FROM STDIN WITH (FORMAT csv);")
+        self.assertEqual(buffer.getvalue(),
+                         'Title,Author,1990,Genre,111\r\n"Title, with comma",Author,1985,Genre,444\r\n')
+
+    @patch('Controllers.controllers.get_connection')
+    def test_bulk_add_books_loads_in_batches(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        mock_cursor.fetchall.return_value = []
+        books = [('Title', 'Author', '1990', 'Genre', str(code)) for code in range(100, 105)]
+
+        controller = BookController()
+        report = controller.bulk_add_books(books, batch_size=2)
+
+        self.assertEqual(len(report['accepted']), 5)
+        self.assertEqual(mock_cursor.copy_expert.call_count, 3)
+
+    @patch('Controllers.controllers.get_connection')
+    def test_iter_books_streams_through_a_named_cursor(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        book = (1, 'Title', 'Author', 1900, 'Genre', '1234567891')
+        mock_cursor.__iter__.return_value = iter([book])
+
+        controller = BookController()
+        result = list(controller.iter_books(after=(10, ), itersize=500))
+
+        mock_conn.cursor.assert_called_with(name='iter_books', cursor_factory=BookCursor)
+        self.assertEqual(mock_cursor.itersize, 500)
+        mock_cursor.execute.assert_called_once_with("SELECT * FROM books WHERE (id) > (%s) ORDER BY id", (10, ))
+        self.assertEqual(result, [book])
+
+    @patch('Controllers.controllers.get_connection')
+    def test_iter_books_pushes_ordering_down_to_sql(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        controller = BookController()
+        list(controller.iter_books(order_by=('title', 'isbn_code'), descending=True))
+
+        mock_cursor.execute.assert_called_once_with("SELECT * FROM books ORDER BY title DESC, isbn_code DESC", ())
+
+    @patch('Controllers.controllers.get_connection')
+    def test_iter_books_resumes_after_a_row_of_a_non_unique_ordering(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        controller = BookController()
+        list(controller.iter_books(after=('Dom Casmurro', 7), order_by='title'))
+
+        # the id breaks the ties between equal titles
+        mock_cursor.execute.assert_called_once_with(
+            "SELECT * FROM books WHERE (title, id) > (%s, %s) ORDER BY title, id", ('Dom Casmurro', 7))
+
+    @patch('Controllers.controllers.get_connection')
+    def test_iter_books_by_page_reads_each_page_in_its_own_transaction(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        first = [Book(2, 'B', 'Author', 1900, 'Genre', '2'), Book(1, 'A', 'Author', 1900, 'Genre', '1')]
+        mock_cursor.fetchall.side_effect = [first, [Book(3, 'A', 'Author', 1900, 'Genre', '0')]]
+
+        controller = BookController()
+        mock_conn.__exit__.reset_mock()
+        books = controller.iter_books_by_page(2, order_by=('title', 'isbn_code'), descending=True)
+
+        self.assertEqual(next(books), first[0])
+        # the transaction of the page ended before its rows were handed out
+        mock_conn.__exit__.assert_called_once()
+        self.assertEqual([book.id for book in books], [1, 3])
+        self.assertEqual(mock_cursor.execute.call_args_list, [
+            mock.call("SELECT * FROM books ORDER BY title DESC, isbn_code DESC LIMIT %s", (2, )),
+            mock.call("SELECT * FROM books WHERE (title, isbn_code) < (%s, %s) ORDER BY title DESC, isbn_code DESC LIMIT %s",
+                 ('A', '1', 2)),
+        ])
+
+    @patch('Controllers.controllers.get_connection')
+    def test_iter_books_rejects_unknown_order_by_columns(self, mock_get_connection):
+        mock_get_connection.return_value = MagicMock()
+
+        controller = BookController()
+
+        with pytest.raises(ValueError):
+            list(controller.iter_books(order_by='title; DROP TABLE books'))
+
     @patch('Controllers.controllers.get_connection')
     def test_list_all_books_returns_none_if_there_arent_books(self, mock_get_connection):
         
@@ -168,7 +367,7 @@ class TestBookController(unittest.TestCase):
 
         result = controller.search_by_book_code('789456123')
 
-        mock_cursor.execute.assert_called_once_with('SELECT * FROM books WHERE isbn_code = %s', ('789456123',))        
+        mock_cursor.execute.assert_called_with('EXECUTE book_by_isbn (%s)', ('789456123',))
         self.assertEqual(result, expected_result)
 
     @patch('Controllers.controllers.get_connection')
@@ -186,29 +385,128 @@ class TestBookController(unittest.TestCase):
 
         result = controller.search_by_book_code('2223335544')
 
-        mock_cursor.execute.assert_called_once_with('SELECT * FROM books WHERE isbn_code = %s', ('2223335544', ))
+        mock_cursor.execute.assert_called_with('EXECUTE book_by_isbn (%s)', ('2223335544', ))
         self.assertIsNone(result)
 
     @patch('Controllers.controllers.get_connection')
-    @patch('Controllers.controllers.BookController.search_by_book_code')
-    def test_delete_book_deletes_the_given_book_from_the_db(self, mock_search_by_book_code, mock_get_connection):
+    def test_search_returns_similar_books(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        expected_result = [(3, 'Dom Casmurro', 'Machado de Assis', 1899, 'Romance', '789456123')]
+        mock_cursor.fetchall.return_value = expected_result
+
+        controller = BookController()
+        result = controller.search(' machdo ', limit=5)
+
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn('<%% title', query)
+        self.assertEqual(params, {'text': 'machdo', 'limit': 5})
+        self.assertEqual(result, expected_result)
+
+    @patch('Controllers.controllers.get_connection')
+    def test_search_with_empty_text_doesnt_query(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_get_connection.return_value = mock_conn
+
+        controller = BookController()
+
+        self.assertEqual(controller.search('   '), [])
+        mock_conn.cursor.assert_not_called()
+
+    @patch('Controllers.controllers.get_connection')
+    def test_search_book_by_code_is_served_from_cache_until_the_book_changes(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        book = (3, 'Title', 'Author', 1978, 'Genre', '789456123')
+        mock_cursor.fetchone.return_value = book
+
+        controller = BookController()
+        controller.search_by_book_code('789456123')
+        controller.search_by_book_code('789456123')
+        result = controller.update_book('789456123', 'New title', 'Author', '1978', 'Genre')
+        controller.search_by_book_code('789456123')
+
+        self.assertTrue(result)
+        self.assertEqual(mock_cursor.fetchone.call_count, 2)
+        self.assertEqual(controller.cache.stats()['hits'], 1)
+
+    @patch('Controllers.controllers.get_connection')
+    def test_search_by_book_codes_queries_in_chunks_and_marks_missing_codes(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        book1 = Book(1, 'Title', 'Author', 1978, 'Genre', '111')
+        book3 = Book(3, 'Title', 'Author', 1978, 'Genre', '333')
+        mock_cursor.fetchall.side_effect = [[book1], [book3]]
+
+        controller = BookController()
+        result = controller.search_by_book_codes(['111', 222, '333', '111'], chunk_size=2)
+
+        self.assertEqual(result, {'111': book1, '222': None, '333': book3})
+        self.assertEqual(mock_cursor.execute.call_args_list[1::2], [
+            mock.call("EXECUTE books_by_isbns (%s)", (['111', '222'], )),
+            mock.call("EXECUTE books_by_isbns (%s)", (['333'], )),
+        ])
+
+    @patch('Controllers.controllers.get_connection')
+    def test_search_by_book_codes_only_queries_uncached_codes(self, mock_get_connection):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
+
         mock_conn.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
         mock_get_connection.return_value = mock_conn
 
+        book = Book(1, 'Title', 'Author', 1978, 'Genre', '111')
+        mock_cursor.fetchone.return_value = book
+        mock_cursor.fetchall.return_value = []
+
         controller = BookController()
+        controller.search_by_book_code('111')
+        result = controller.search_by_book_codes(['111', '222'])
+
+        self.assertEqual(result, {'111': book, '222': None})
+        mock_cursor.execute.assert_called_with("EXECUTE books_by_isbns (%s)", (['222'], ))
 
-        mock_search_by_book_code.return_value = (1, 'Title', 'Author', 1900, 'Genre', '456789123')
+    @patch('Controllers.controllers.get_connection')
+    def test_delete_book_deletes_the_given_book_from_the_db(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        controller = BookController()
+
+        mock_cursor.rowcount = 1
         result = controller.delete_book('456789123')
 
-        mock_cursor.execute.assert_called_once_with('DELETE FROM books WHERE isbn_code = %s', ('456789123', ))
+        mock_cursor.execute.assert_called_with('EXECUTE delete_book (%s)', ('456789123', ))
         self.assertTrue(result)
 
-    @patch('Controllers.controllers.BookController.search_by_book_code')
-    def test_delete_book_returns_false_if_doesnt_find_the_searched_book(self, mock_search_by_book_code):
-        mock_search_by_book_code.return_value = None
+    @patch('Controllers.controllers.get_connection')
+    def test_delete_book_returns_false_if_doesnt_find_the_searched_book(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        mock_cursor.rowcount = 0
 
         controller = BookController()
 
@@ -217,8 +515,7 @@ class TestBookController(unittest.TestCase):
         self.assertFalse(result)
         
     @patch('Controllers.controllers.get_connection')    
-    @patch('Controllers.controllers.BookController.search_by_book_code')
-    def test_update_book_with_valid_data(self, mock_search_by_book_code, mock_get_connection):
+    def test_update_book_with_valid_data(self, mock_get_connection):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
 
@@ -227,27 +524,31 @@ class TestBookController(unittest.TestCase):
         mock_get_connection.return_value = mock_conn
 
         returned_book = (1, 'title', 'author', 1980, 'genre', '45678913455')
+        mock_cursor.rowcount = 1
 
         controller = BookController()
-        mock_search_by_book_code.return_value = returned_book
 
         result = controller.update_book(returned_book[5], 'Updated title', 'Updated author', 1981, 'Updated genre')
         
-        mock_cursor.execute.assert_called_once_with("""
-                 UPDATE books SET (title, author, year, genre) = (%s, %s, %s, %s)
-                 WHERE isbn_code = %s;
-                 """, 
+        mock_cursor.execute.assert_called_with("EXECUTE update_book (%s, %s, %s, %s, %s)",
                  ('Updated title', 'Updated author', 1981, 'Updated genre', '45678913455', )
                  )
         self.assertTrue(result)
 
-    @patch('Controllers.controllers.BookController.search_by_book_code')
-    def test_update_book_returns_none_when_doesnt_find_the_searched_book(self, mock_search_by_book_code):
-        mock_search_by_book_code.return_value = None
+    @patch('Controllers.controllers.get_connection')
+    def test_update_book_returns_none_when_doesnt_find_the_searched_book(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        mock_cursor.rowcount = 0
 
         controller = BookController()
 
-        result = controller.update_book('01010101')
+        result = controller.update_book('01010101', 'Title', 'Author', 1990, 'Genre')
 
         self.assertFalse(result)
 
@@ -278,8 +579,7 @@ class TestUserController(unittest.TestCase):
             controller = UserController()
 
     @patch('Controllers.controllers.get_connection')
-    @patch('Controllers.controllers.UserController.find_by_user_code')
-    def test_register_user_register_with_valid_fields(self, mock_find_by_user_code, mock_get_connection):
+    def test_register_user_register_with_valid_fields(self, mock_get_connection):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
 
@@ -287,13 +587,13 @@ class TestUserController(unittest.TestCase):
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
         mock_get_connection.return_value = mock_conn        
-        mock_find_by_user_code.return_value = None
+        mock_cursor.fetchone.return_value = (1, )
 
         controller = UserController()
 
         result = controller.register_user('Name', 'email@test.com', '11977774444', 1000)
 
-        mock_cursor.execute.assert_called_once_with("INSERT INTO users (name, email, phone, user_code) VALUES (%s, %s, %s, %s);", ('Name', 'email@test.com', '11977774444', 1000))
+        mock_cursor.execute.assert_called_with("EXECUTE insert_user (%s, %s, %s, %s)", ('Name', 'email@test.com', '11977774444', 1000))
         self.assertEqual(result, "Success! User registered.")
 
     @patch('Controllers.controllers.get_connection')
@@ -406,25 +706,88 @@ class TestUserController(unittest.TestCase):
             with pytest.raises(EmailFormatError):
                 controller.register_user(name, email, phone, user_code)
 
-    @patch("Controllers.controllers.UserController.find_by_user_code")
     @patch("Controllers.controllers.get_connection")
-    def test_register_user_duplicated_user_code(self, mock_get_connection, mock_find_by_user_code):
+    def test_register_user_duplicated_user_code(self, mock_get_connection):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
 
         mock_conn.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
-        expected_result = ('Some Name', 'someemail@test.com', '11999994444', 1000)
-
         mock_get_connection.return_value = mock_conn    
-        mock_find_by_user_code.return_value = expected_result
+        mock_cursor.fetchone.return_value = None  # ON CONFLICT DO NOTHING returned no row
 
         controller = UserController()
 
         with pytest.raises(DuplicateError):
             controller.register_user('Some Name', 'someemail@test.com', '11999994444', 1000)
 
+    @patch("Controllers.controllers.get_connection")
+    def test_register_user_with_an_email_taken_by_another_user_code(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+
+        mock_get_connection.return_value = mock_conn
+        # the upsert's conflict target is the user code, the e-mail index still raises
+        def execute(query, params=None):
+            if query.startswith('EXECUTE'):
+                raise psycopg2.errors.UniqueViolation()
+        mock_cursor.execute.side_effect = execute
+
+        controller = UserController()
+
+        with pytest.raises(DuplicateError):
+            controller.register_user('Some Name', 'someemail@test.com', '11999994444', 1000, upsert=True)
+        self.assertIn('ON CONFLICT DO NOTHING', STATEMENTS['insert_user'])
+
+    @patch('Controllers.controllers.get_connection')
+    def test_bulk_register_users_copies_valid_rows_and_reports_rejected_ones(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        mock_cursor.fetchall.return_value = [(1001, 'taken@test.com')]
+
+        users = [
+            ('Name', 'one@test.com', '11999994444', 1000),
+            ('Name', 'taken@test.com', '11999994444', 1001),  # already registered
+            ('Name', 'invalid', '11999994444', 1002),  # bad e-mail
+            ('Name', 'four@test.com', '119', 1003),  # bad phone
+            ('Name', 'five@test.com', 11999994444, 1004),  # JSON number as phone
+            (None, 'six@test.com', '11999994444', 1005),  # missing name
+        ]
+
+        controller = UserController()
+        report = controller.bulk_register_users(users)
+
+        self.assertEqual(report['accepted'], [(0, 1000)])
+        self.assertEqual([(position, code) for position, code, _ in report['rejected']],
+                         [(2, 1002), (3, 1003), (4, 1004), (5, 1005), (1, 1001)])
+        query, buffer = mock_cursor.copy_expert.call_args[0]
+        self.assertEqual(query, "COPY users (name, email, phone, user_code) FROM STDIN WITH (FORMAT csv);")
+        self.assertEqual(buffer.getvalue(), 'Name,one@test.com,11999994444,1000\r\n')
+
+    @patch('Controllers.controllers.get_connection')
+    def test_iter_users_by_page_orders_by_id_after_non_unique_columns(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+        mock_cursor.fetchall.return_value = []
+
+        controller = UserController()
+        list(controller.iter_users_by_page(20, order_by='name'))
+
+        mock_cursor.execute.assert_called_once_with("SELECT * FROM users ORDER BY name, id LIMIT %s", (20, ))
+
     @patch('Controllers.controllers.get_connection')
     def test_list_users_returns_a_list_of_users(self, mock_get_connection):
         mock_conn = MagicMock()
@@ -464,7 +827,7 @@ class TestUserController(unittest.TestCase):
         
         result = controller.find_by_user_code(1000)
 
-        mock_cursor.execute.assert_called_once_with("SELECT * FROM users WHERE user_code = %s;", (1000, ))
+        mock_cursor.execute.assert_called_with("EXECUTE user_by_code (%s)", (1000, ))
         self.assertEqual(result, expected_result)
 
     @patch("Controllers.controllers.get_connection")
@@ -481,34 +844,55 @@ class TestUserController(unittest.TestCase):
         controller = UserController()
 
         result = controller.find_by_user_code(789123)
-        mock_cursor.execute.assert_called_once_with("SELECT * FROM users WHERE user_code = %s;", (789123, ))
+        mock_cursor.execute.assert_called_with("EXECUTE user_by_code (%s)", (789123, ))
         self.assertIsNone(result)
 
-    @patch("Controllers.controllers.UserController.find_by_user_code")
     @patch("Controllers.controllers.get_connection")
-    def test_delete_user(self, mock_get_connection, mock_find_by_user_code):
+    def test_find_by_user_codes_marks_missing_codes(self, mock_get_connection):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
 
         mock_conn.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_get_connection.return_value = mock_conn
+
+        user = User(1, 'User One', 'uone@test.com', '12345678910', 1000)
+        mock_cursor.fetchall.return_value = [user]
 
-        expected_result = MagicMock()
+        controller = UserController()
+        result = controller.find_by_user_codes([1000, '2000'])
+
+        mock_cursor.execute.assert_called_with("EXECUTE users_by_codes (%s)", ([1000, 2000], ))
+        self.assertEqual(result, {1000: user, 2000: None})
+
+    @patch("Controllers.controllers.get_connection")
+    def test_delete_user(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
         mock_get_connection.return_value = mock_conn    
-        mock_find_by_user_code.return_value = expected_result
+        mock_cursor.rowcount = 1
 
         controller = UserController()
 
         result = controller.delete_user(1000)
 
-        mock_cursor.execute.assert_called_once_with("DELETE FROM users WHERE user_code = %s;", (1000, ))
+        mock_cursor.execute.assert_called_with("EXECUTE delete_user (%s)", (1000, ))
         self.assertTrue(result)
 
-    @patch("Controllers.controllers.UserController.find_by_user_code")
-    def test_delete_user_returns_false_if_user_code_doesnt_exists(self, mock_find_by_user_code):
+    @patch("Controllers.controllers.get_connection")
+    def test_delete_user_returns_false_if_user_code_doesnt_exists(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
 
-        mock_find_by_user_code.return_value = False
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+
+        mock_get_connection.return_value = mock_conn
+        mock_cursor.rowcount = 0
 
         controller = UserController()
 
@@ -517,32 +901,33 @@ class TestUserController(unittest.TestCase):
         self.assertFalse(result)
 
     @patch('Controllers.controllers.get_connection')
-    @patch('Controllers.controllers.UserController.find_by_user_code')
-    def test_update_user(self, mock_find_by_user_code, mock_get_connection):
+    def test_update_user(self, mock_get_connection):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
 
         mock_conn.__enter__.return_value = mock_conn
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
 
-        expected_result = MagicMock()
-
         mock_get_connection.return_value = mock_conn    
-        mock_find_by_user_code.return_value = expected_result
+        mock_cursor.rowcount = 1
 
         controller = UserController()
 
         result = controller.update_user(2000, 'Updated Name', 'updated@email.com', '11444477777')
 
-        mock_cursor.execute.assert_called_once_with("""
-                 UPDATE users SET (name, email, phone) = (%s, %s, %s)
-                 WHERE user_code = %s;
-                 """, ('Updated Name', 'updated@email.com', '11444477777', 2000, ))
+        mock_cursor.execute.assert_called_with("EXECUTE update_user (%s, %s, %s, %s)", ('Updated Name', 'updated@email.com', '11444477777', 2000, ))
         self.assertTrue(result)
 
-    @patch("Controllers.controllers.UserController.find_by_user_code")
-    def test_update_user_returns_none_when_doesnt_find_the_searched_user(self, mock_find_by_user_code):
-        mock_find_by_user_code.return_value = None
+    @patch("Controllers.controllers.get_connection")
+    def test_update_user_returns_none_when_doesnt_find_the_searched_user(self, mock_get_connection):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+
+        mock_get_connection.return_value = mock_conn
+        mock_cursor.rowcount = 0
         controller = UserController()
         result = controller.update_user(2000, 'Updated Name', 'updated@email.com', '11444477777')
         self.assertIsNone(result)
@@ -0,0 +1,144 @@
+from db_connection import ConnectionPool, PooledConnection, PreparedConnection, get_connection
+from Exceptions.exceptions import PoolTimeoutError, PoolClosedError
+from psycopg2 import extensions
+from unittest.mock import patch, MagicMock
+import psycopg2, pytest, time, unittest
+
+
+def make_connection():
+    conn = MagicMock()
+    conn.closed = 0
+    conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    @patch('db_connection.psycopg2.connect')
+    def test_pool_opens_minconn_connections_on_creation(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+
+        pool = ConnectionPool(minconn=2, maxconn=5, dbname='library')
+
+        self.assertEqual(mock_connect.call_count, 2)
+        mock_connect.assert_called_with(connection_factory=PreparedConnection, dbname='library')
+        self.assertEqual(pool.size, 2)
+
+    @patch('db_connection.psycopg2.connect')
+    def test_returned_connection_is_reused(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(minconn=0, maxconn=5)
+
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(mock_connect.call_count, 1)
+
+    @patch('db_connection.psycopg2.connect')
+    def test_getconn_raises_pool_timeout_error_when_exhausted(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(minconn=0, maxconn=1, checkout_timeout=0.01)
+
+        pool.getconn()
+
+        with pytest.raises(PoolTimeoutError):
+            pool.getconn()
+
+    @patch('db_connection.psycopg2.connect')
+    def test_closed_connection_is_replaced_on_checkout(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(minconn=1, maxconn=1)
+        broken = pool._idle[0][0]
+        broken.closed = 1
+
+        conn = pool.getconn()
+
+        self.assertIsNot(conn, broken)
+        self.assertEqual(mock_connect.call_count, 2)
+
+    @patch('db_connection.psycopg2.connect')
+    def test_stale_connection_failing_health_check_is_replaced(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(minconn=1, maxconn=1, check_interval=0)
+        stale = pool._idle[0][0]
+        stale.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError()
+
+        conn = pool.getconn()
+
+        self.assertIsNot(conn, stale)
+        stale.close.assert_called_once()
+
+    @patch('db_connection.psycopg2.connect')
+    def test_idle_connections_above_minconn_are_reaped(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(minconn=1, maxconn=3, idle_timeout=0)
+        first, second = pool.getconn(), pool.getconn()
+
+        pool.putconn(first)
+        time.sleep(0.01)
+        pool.putconn(second)
+
+        self.assertEqual(pool.size, 1)
+        first.close.assert_called_once()
+
+    @patch('db_connection.psycopg2.connect')
+    def test_putconn_rolls_back_unfinished_transaction(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(minconn=0, maxconn=1)
+        conn = pool.getconn()
+        conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INTRANS
+
+        pool.putconn(conn)
+
+        conn.rollback.assert_called_once()
+
+    @patch('db_connection.psycopg2.connect')
+    def test_getconn_raises_pool_closed_error_after_closeall(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: make_connection()
+        pool = ConnectionPool(minconn=1, maxconn=1)
+        conn = pool._idle[0][0]
+
+        pool.closeall()
+
+        conn.close.assert_called_once()
+        with pytest.raises(PoolClosedError):
+            pool.getconn()
+
+
+class TestPooledConnection(unittest.TestCase):
+
+    def test_commits_and_returns_connection_to_the_pool(self):
+        mock_pool = MagicMock()
+        mock_conn = mock_pool.getconn.return_value
+
+        with PooledConnection(mock_pool) as conn:
+            self.assertIs(conn, mock_conn)
+
+        mock_conn.commit.assert_called_once()
+        mock_pool.putconn.assert_called_once_with(mock_conn)
+
+    def test_rolls_back_and_returns_connection_on_error(self):
+        mock_pool = MagicMock()
+        mock_conn = mock_pool.getconn.return_value
+
+        with pytest.raises(ValueError):
+            with PooledConnection(mock_pool):
+                raise ValueError()
+
+        mock_conn.rollback.assert_called_once()
+        mock_conn.commit.assert_not_called()
+        mock_pool.putconn.assert_called_once_with(mock_conn)
+
+    @patch('db_connection.get_pool')
+    def test_get_connection_returns_none_if_database_is_unreachable(self, mock_get_pool):
+        mock_get_pool.side_effect = psycopg2.OperationalError('connection refused')
+
+        self.assertIsNone(get_connection())
+
+    @patch('db_connection.get_pool')
+    def test_get_connection_lets_pool_timeouts_through(self, mock_get_pool):
+        mock_get_pool.return_value.getconn.side_effect = PoolTimeoutError(10, 30)
+
+        with pytest.raises(PoolTimeoutError):
+            get_connection()
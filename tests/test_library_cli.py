@@ -0,0 +1,118 @@
+from library_cli import import_file, export_file, save_checkpoint, to_row
+from Models.models import Book, User
+from unittest.mock import MagicMock
+import json, os, tempfile, unittest
+
+
+class TestLibraryCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_to_row_converts_user_code_to_int(self):
+        row = to_row('users', {'name': 'Name', 'email': 'a@b.com', 'phone': '11999994444', 'user_code': '1000'})
+
+        self.assertEqual(row, ('Name', 'a@b.com', '11999994444', 1000))
+
+    def test_import_loads_csv_in_batches_and_removes_checkpoint(self):
+        path = self.path('books.csv')
+        with open(path, 'w') as file:
+            file.write('title,author,year,genre,isbn_code\n')
+            for code in range(5):
+                file.write(f'Title {code},Author,1990,Genre,{code}\n')
+
+        controller = MagicMock()
+        controller.bulk_add_books.side_effect = lambda batch, batch_size: {
+            'accepted': [(position, row[4]) for position, row in enumerate(batch)], 'rejected': []}
+
+        summary = import_file(path, 'books', 'csv', batch_size=2, controller=controller)
+
+        self.assertEqual(summary['accepted'], 5)
+        self.assertEqual(controller.bulk_add_books.call_count, 3)
+        self.assertEqual(controller.bulk_add_books.call_args_list[0][0][0],
+                         [('Title 0', 'Author', '1990', 'Genre', '0'), ('Title 1', 'Author', '1990', 'Genre', '1')])
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_import_resumes_after_the_checkpointed_rows(self):
+        path = self.path('users.jsonl')
+        with open(path, 'w') as file:
+            for code in range(1000, 1004):
+                file.write(json.dumps({'name': 'Name', 'email': f'{code}@test.com',
+                                       'phone': '11999994444', 'user_code': code}) + '\n')
+        save_checkpoint(f'{path}.checkpoint', {'rows': 3})
+        rejects = self.path('rejects.jsonl')
+
+        controller = MagicMock()
+        controller.bulk_register_users.return_value = {'accepted': [], 'rejected': [(0, 1003, 'duplicated')]}
+
+        summary = import_file(path, 'users', 'jsonl', resume=True, rejects_path=rejects, controller=controller)
+
+        controller.bulk_register_users.assert_called_once_with(
+            [('Name', '1003@test.com', '11999994444', 1003)], batch_size=5000)
+        self.assertEqual(summary['rows'], 4)
+        with open(rejects) as file:
+            self.assertEqual(json.loads(file.readline()), {'row': 4, 'code': 1003, 'reason': 'duplicated'})
+
+    def test_export_writes_csv_without_ids(self):
+        path = self.path('books.csv')
+        controller = MagicMock()
+        controller.iter_books.return_value = iter([Book(1, 'Title', 'Author', 1990, 'Genre', '111'),
+                                                   Book(2, 'Other', 'Author', 1991, 'Genre', '222')])
+
+        summary = export_file(path, 'books', 'csv', controller=controller)
+
+        self.assertEqual(summary['rows'], 2)
+        controller.iter_books.assert_called_once_with(after=None, itersize=2000, order_by=('id', ))
+        with open(path, newline='') as file:
+            self.assertEqual(file.read(), 'title,author,year,genre,isbn_code\r\n'
+                                          'Title,Author,1990,Genre,111\r\nOther,Author,1991,Genre,222\r\n')
+
+    def test_export_resumes_after_the_checkpointed_id(self):
+        path = self.path('users.jsonl')
+        with open(path, 'w') as file:
+            file.write('{"name": "One"}\n{"name": "partial')
+        save_checkpoint(f'{path}.checkpoint', {'rows': 1, 'order_by': ['id'], 'after': [7],
+                                               'offset': len('{"name": "One"}\n')})
+        controller = MagicMock()
+        controller.iter_users.return_value = iter([User(8, 'Two', 'two@test.com', '11999994444', 1001)])
+
+        summary = export_file(path, 'users', 'jsonl', resume=True, controller=controller)
+
+        controller.iter_users.assert_called_once_with(after=[7], itersize=2000, order_by=('id', ))
+        self.assertEqual(summary['rows'], 2)
+        with open(path) as file:
+            lines = file.read().splitlines()
+        self.assertEqual(lines[0], '{"name": "One"}')
+        self.assertEqual(json.loads(lines[1])['user_code'], 1001)
+
+    def test_export_resumes_in_the_order_it_started_with(self):
+        path = self.path('books.csv')
+        books = [Book(3, 'A', 'Author', 1990, 'Genre', '333'), Book(1, 'B', 'Author', 1990, 'Genre', '111'),
+                 Book(2, 'B', 'Author', 1991, 'Genre', '222')]
+        controller = MagicMock()
+
+        def interrupted(rows):
+            # stops writing after the second row, past its checkpoint
+            for position, row in enumerate(rows):
+                if position == 2:
+                    raise KeyboardInterrupt()
+                yield row
+
+        controller.iter_books.side_effect = [interrupted(books), iter(books[2:])]
+        with self.assertRaises(KeyboardInterrupt):
+            export_file(path, 'books', 'csv', itersize=2, controller=controller, order_by='title')
+        with open(f'{path}.checkpoint') as file:
+            self.assertEqual(json.load(file)['after'], ['B', 1])
+
+        summary = export_file(path, 'books', 'csv', itersize=2, resume=True, controller=controller)
+
+        # the checkpointed ordering wins over the default id one of the resumed call
+        controller.iter_books.assert_called_with(after=['B', 1], itersize=2, order_by=('title', 'id'))
+        self.assertEqual(summary['rows'], 3)
+        with open(path, newline='') as file:
+            self.assertEqual([line.split(',')[-1] for line in file.read().splitlines()],
+                             ['isbn_code', '333', '111', '222'])
@@ -0,0 +1,87 @@
+from Controllers.metrics import MetricsRegistry, instrumented, percentile
+from unittest.mock import patch
+import asyncio, unittest
+
+
+class Controller():
+
+    @instrumented
+    def find(self, code):
+        if code is None:
+            raise ValueError('missing code')
+        return (1, code) if code else None
+
+    @instrumented
+    def list_all(self):
+        return [(1, 'a'), (2, 'b'), (3, 'c')]
+
+    @instrumented
+    def iter_all(self):
+        yield from self.list_all()
+
+    @instrumented
+    async def fetch_all(self):
+        return self.list_all()
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry(enabled=True)
+        patcher = patch('Controllers.metrics.registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_calls_rows_and_errors_are_recorded_per_method(self):
+        controller = Controller()
+        controller.find('123')
+        controller.find('')
+        with self.assertRaises(ValueError):
+            controller.find(None)
+        controller.list_all()
+
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['Controller.find']['calls'], 3)
+        self.assertEqual(snapshot['Controller.find']['errors'], 1)
+        self.assertEqual(snapshot['Controller.find']['rows'], 1)
+        self.assertEqual(snapshot['Controller.list_all']['rows'], 3)
+
+    def test_generator_is_recorded_when_closed(self):
+        rows = Controller().iter_all()
+        next(rows)
+        next(rows)
+        rows.close()
+
+        self.assertEqual(self.registry.snapshot()['Controller.iter_all']['rows'], 2)
+
+    def test_coroutine_is_recorded_when_awaited(self):
+        asyncio.run(Controller().fetch_all())
+
+        self.assertEqual(self.registry.snapshot()['Controller.fetch_all']['rows'], 3)
+
+    def test_nothing_is_recorded_while_disabled(self):
+        self.registry.disable()
+
+        Controller().list_all()
+        list(Controller().iter_all())
+
+        self.assertEqual(self.registry.snapshot(), {})
+
+    def test_percentiles_use_the_latency_samples(self):
+        samples = [n / 100 for n in range(1, 101)]
+
+        self.assertEqual(percentile(samples, 0.5), 0.51)
+        self.assertEqual(percentile(samples, 0.99), 1.0)
+        self.assertEqual(percentile([], 0.95), 0.0)
+
+    def test_prometheus_dump(self):
+        self.registry.record('BookController.add_book', 0.5, rows=1)
+        self.registry.record('BookController.add_book', 1.5, error=True)
+
+        dump = self.registry.to_prometheus()
+
+        self.assertIn('library_controller_calls_total{method="BookController.add_book"} 2', dump)
+        self.assertIn('library_controller_errors_total{method="BookController.add_book"} 1', dump)
+        self.assertIn('library_controller_latency_seconds{method="BookController.add_book",quantile="0.99"} 1.5',
+                      dump)
+        self.assertIn('library_controller_latency_seconds_sum{method="BookController.add_book"} 2.0', dump)
@@ -0,0 +1,20 @@
+from Models.models import Book, User
+import unittest
+
+
+class TestModels(unittest.TestCase):
+
+    def test_book_record_is_a_slotted_immutable_tuple(self):
+        book = Book(1, 'Title', 'Author', 1990, 'Genre', '123')
+
+        self.assertEqual(book, (1, 'Title', 'Author', 1990, 'Genre', '123'))
+        self.assertEqual(book.isbn_code, '123')
+        self.assertFalse(hasattr(book, '__dict__'))
+        with self.assertRaises(AttributeError):
+            book.title = 'Other'
+
+    def test_records_are_built_from_database_rows(self):
+        user = User._make((1, 'Name', 'a@b.com', '11999994444', 1000))
+
+        self.assertEqual(user.user_code, 1000)
+        self.assertEqual(user.show_info(), ' User code: 1000 | Name: Name | E-mail: a@b.com | Phone: 11999994444')
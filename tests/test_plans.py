@@ -0,0 +1,81 @@
+from Controllers.plans import HOT_QUERIES, INDEXES, check_plans, create_indexes
+from query_plans import plan_problems
+from unittest.mock import call, patch
+import psycopg2, unittest
+
+
+def scan(node_type):
+    return {'Node Type': node_type, 'Relation Name': 'books'}
+
+
+class TestPlanProblems(unittest.TestCase):
+
+    def test_nested_sequential_scans_are_reported(self):
+        plan = {'Node Type': 'Nested Loop', 'Plans': [scan('Index Scan'), scan('Seq Scan')]}
+
+        self.assertEqual(plan_problems(plan), ['sequential scan on books'])
+
+    def test_sorts_only_fail_ordered_queries(self):
+        plan = {'Node Type': 'Sort', 'Sort Key': ['title DESC', 'id DESC'], 'Plans': [scan('Index Scan')]}
+
+        self.assertEqual(plan_problems(plan), [])
+        self.assertEqual(plan_problems(plan, ordered=True), ['sort on title DESC, id DESC'])
+
+    def test_expected_index_must_appear_in_the_plan(self):
+        plan = {'Node Type': 'Index Scan', 'Relation Name': 'books', 'Index Name': 'books_pkey'}
+
+        self.assertEqual(plan_problems(plan, index='books_pkey'), [])
+        self.assertEqual(plan_problems(plan, index='books_listing_idx'), ['books_listing_idx not used (books_pkey)'])
+
+
+class TestCheckPlans(unittest.TestCase):
+
+    @patch('Controllers.plans.get_connection')
+    def test_prepared_statements_are_explained_and_rolled_back(self, mock_get_connection):
+        conn = mock_get_connection.return_value.__enter__.return_value
+        conn.prepared = set()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.connection = conn
+        cursor.fetchone.side_effect = [([{'Plan': scan('Index Scan')}], ), ([{'Plan': scan('Seq Scan')}], )]
+
+        failures = check_plans([
+            ('lookup', 'book_by_isbn', ('123', ), False),
+            ('listing', 'SELECT * FROM books ORDER BY genre', (), True),
+        ])
+
+        self.assertEqual(failures, {'listing': ['sequential scan on books']})
+        self.assertIn(call("EXPLAIN (FORMAT JSON) EXECUTE book_by_isbn (%s)", ('123', )),
+                      cursor.execute.call_args_list)
+        self.assertEqual(conn.prepared, {'book_by_isbn'})
+        conn.rollback.assert_called_once()
+
+    @patch('Controllers.plans.get_connection')
+    def test_query_that_cant_be_planned_fails_alone(self, mock_get_connection):
+        conn = mock_get_connection.return_value.__enter__.return_value
+        cursor = conn.cursor.return_value.__enter__.return_value
+
+        def execute(query, params=None):
+            if '<%' in query:
+                raise psycopg2.ProgrammingError('operator does not exist: unknown <% character varying\nLINE 3')
+        cursor.execute.side_effect = execute
+        cursor.fetchone.return_value = ([{'Plan': scan('Index Scan')}], )
+        search = next(query for query in HOT_QUERIES if query[0] == 'search')
+
+        failures = check_plans([search, ('listing', 'SELECT * FROM books ORDER BY id', (), True)])
+
+        self.assertEqual(failures, {'search': ['not planned: operator does not exist: unknown <% character varying']})
+        self.assertIn(call("ROLLBACK TO SAVEPOINT plan"), cursor.execute.call_args_list)
+
+    @patch('Controllers.plans.get_connection')
+    def test_create_indexes_builds_the_trigram_indexes_after_their_extension(self, mock_get_connection):
+        conn = mock_get_connection.return_value.__enter__.return_value
+        cursor = conn.cursor.return_value.__enter__.return_value
+
+        create_indexes()
+
+        statements = [args[0] for args, _ in cursor.execute.call_args_list]
+        self.assertEqual(statements, INDEXES)
+        extension = statements.index("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        self.assertTrue(all(extension < position for position, statement in enumerate(statements)
+                            if 'gin_trgm_ops' in statement))
+        self.assertEqual(sum('gin_trgm_ops' in statement for statement in statements), 2)
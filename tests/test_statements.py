@@ -0,0 +1,28 @@
+from Controllers.statements import STATEMENTS, execute_prepared
+from unittest import mock
+from unittest.mock import MagicMock
+import unittest
+
+
+class TestExecutePrepared(unittest.TestCase):
+
+    def test_statement_is_prepared_once_per_connection(self):
+        cursor = MagicMock()
+        cursor.connection.prepared = set()
+
+        execute_prepared(cursor, 'book_by_isbn', ('123', ))
+        execute_prepared(cursor, 'book_by_isbn', ('456', ))
+
+        self.assertEqual(cursor.execute.call_args_list, [
+            mock.call(f"PREPARE book_by_isbn AS {STATEMENTS['book_by_isbn']}"),
+            mock.call("EXECUTE book_by_isbn (%s)", ('123', )),
+            mock.call("EXECUTE book_by_isbn (%s)", ('456', )),
+        ])
+        self.assertEqual(cursor.connection.prepared, {'book_by_isbn'})
+
+    def test_unknown_statement_raises_key_error(self):
+        cursor = MagicMock()
+        cursor.connection.prepared = set()
+
+        with self.assertRaises(KeyError):
+            execute_prepared(cursor, 'drop_books', ())
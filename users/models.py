@@ -35,6 +35,12 @@ class User(AbstractUser):
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # staff listing of the admin, filtered on is_staff and ordered by e-mail
+            models.Index(fields=['email'], condition=models.Q(is_staff=True), name='users_user_staff_email_idx'),
+        ]
+
     USERNAME_FIELD = 'email'  # Define o campo email como identificador para login
     REQUIRED_FIELDS = ['cpf', 'first_name', 'last_name']  # Remove username da lista de campos obrigatórios
 